@@ -1,3 +1,32 @@
 from .fingering import computeFingering
+from .fingering import warmup
 from .midi import nameToMidi
 from .midi import listToMidi
+from .midi import stringToMidi
+
+
+# The other functions are imported on their first use, to keep the import of the
+# package cheap (the pool of processes of 'parallel' requires a lot of modules)
+LAZY_ATTRIBUTES = {
+    'computeFingeringKBest': 'kbest',
+    'computeFingeringBatch': 'parallel',
+    'iterFingeringBatch': 'parallel',
+    'iterFingering': 'streaming',
+    'FingeringSession': 'session',
+}
+
+
+def __getattr__(name):
+    module = LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
+
+    from importlib import import_module
+    value = getattr(import_module('.' + module, __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(list(globals().keys()) + list(LAZY_ATTRIBUTES.keys()))
@@ -0,0 +1,258 @@
+# Caches used by the fingering algorithm
+#
+# Real pieces repeat the same groups of notes all the time (scales, Alberti
+# bass, repeated chords, ...). The costs only depend on the intervals between
+# the notes and on the colors of their keys, so once transposed, a lot of those
+# groups share the same costs, as long as the colors of the keys don't change.
+#
+# The same is true for whole phrases (repeated or transposed passages, exercises,
+# ...): 'PhraseCache' keeps their fingering, and can save it in a file.
+
+
+from collections import OrderedDict
+import threading
+from .cost import COLOR
+
+
+#----------------------------------------------------------
+
+
+class LRUCache(object):
+    """Bounded cache, discarding the least recently used entries first
+
+    The number of hits, misses and evictions is counted, see 'stats()'. A
+    'maxsize' of 0 disables the cache.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if self.maxsize <= 0:
+                return
+
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        """Remove all the entries (the statistics are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def resetStats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """Return a dictionary with the number of hits, misses and evictions, the
+        hit rate, and the current and maximum sizes of the cache
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                hit_rate=float(self.hits) / lookups if lookups > 0 else 0.0,
+                size=len(self._entries),
+                maxsize=self.maxsize,
+            )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _evict(self):
+        while len(self._entries) > max(self.maxsize, 0):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+#----------------------------------------------------------
+
+
+def transitionKey(left_or_right, previous_notes, previous_fingers, current_notes,
+                  current_fingers):
+    """Return a key identifying the transition between two groups of notes, up
+    to a transposition that doesn't change the colors of the keys
+
+    The fingers are the ones imposed by the user (or None), since they change
+    the possible fingerings of the groups.
+    """
+    notes = list(previous_notes) + list(current_notes)
+    reference = notes[0] if len(notes) > 0 else 0
+
+    return (left_or_right,
+            len(previous_notes),
+            tuple([ note - reference for note in notes ]),
+            tuple([ COLOR[note % 12] for note in notes ]),
+            None if previous_fingers is None else tuple(previous_fingers),
+            None if current_fingers is None else tuple(current_fingers))
+
+
+def phraseKey(left_or_right, notes, beam=None, margin=None):
+    """Return a key identifying a list of MIDI notes (in the formats accepted by
+    'computeFingering()'), up to a transposition that doesn't change the colors of
+    the keys
+
+    The fingers imposed by the user, the rests and the parameters of the
+    approximate mode are part of the key, since they change the fingering. The
+    empty groups of notes (the rests returned by 'computeFingering()') have their
+    own entry: unlike the rests, they separate the notes around them.
+    """
+    from .fingering import preprocessEntry
+
+    entries = []
+    reference = None
+
+    for entry in notes:
+        infos = preprocessEntry(entry)
+        if infos is None:
+            entries.append(None)
+            continue
+
+        if len(infos.notes) == 0:
+            entries.append(())
+            continue
+
+        if reference is None:
+            reference = infos.notes[0]
+
+        entries.append((tuple([ note - reference for note in infos.notes ]),
+                        tuple([ COLOR[note % 12] for note in infos.notes ]),
+                        None if infos.fingers is None else tuple(infos.fingers)))
+
+    return (left_or_right, beam, margin, tuple(entries))
+
+
+class PhraseCache(object):
+    """Cache of the fingerings of whole lists of MIDI notes, in front of
+    'computeFingering()'
+
+    Transposed lists share the same entry, as long as the colors of the keys don't
+    change (see 'phraseKey()'). At most 'maxsize' entries are kept in memory. If
+    'filename' isn't None, the entries are also saved in that file (see the
+    'shelve' module), and found there by the following processes.
+
+    'stats()' reports the hits and misses, in memory and in the file.
+    """
+
+    def __init__(self, maxsize=1024, filename=None):
+        self.entries = LRUCache(maxsize)
+        self.file_hits = 0
+        self.file_misses = 0
+        self._store = None
+        self._lock = threading.Lock()
+
+        if filename is not None:
+            # The entries of the file are only valid for the current cost functions
+            import shelve
+            from .storage import costParametersHash
+
+            self._store = shelve.open(filename)
+            self._parameters_hash = costParametersHash()
+
+    def computeFingering(self, notes, left_or_right, engine='python', memory='full', workers=1,
+                         beam=None, margin=None):
+        """Same as 'computeFingering()', using the fingering of an already seen list of
+        notes if possible
+        """
+        from .fingering import computeFingering
+        from .fingering import insertRests
+        from .fingering import preprocessNotes
+
+        notes = list(notes)
+        key = phraseKey(left_or_right, notes, beam, margin)
+
+        fingers = self.entries.get(key)
+
+        if (fingers is None) and (self._store is not None):
+            with self._lock:
+                fingers = self._store.get(self._storeKey(key))
+                if fingers is None:
+                    self.file_misses += 1
+                else:
+                    self.file_hits += 1
+
+            if fingers is not None:
+                self.entries.put(key, fingers)
+
+        if fingers is None:
+            result = computeFingering(notes, left_or_right, engine=engine, memory=memory,
+                                      workers=workers, beam=beam, margin=margin)
+
+            fingers = tuple([ tuple(entry['fingers']) for entry in result if len(entry['notes']) > 0 ])
+            self.entries.put(key, fingers)
+
+            if self._store is not None:
+                with self._lock:
+                    self._store[self._storeKey(key)] = fingers
+
+            return result
+
+        infos, rests = preprocessNotes(notes)
+        fingers = iter(fingers)
+
+        return insertRests([ dict(notes=entry.notes,
+                                  fingers=list(next(fingers)) if len(entry.notes) > 0 else [])
+                             for entry in infos ], rests)
+
+    def stats(self):
+        """Return the statistics of the entries kept in memory (see
+        'LRUCache.stats()'), with the number of hits and misses in the file
+        """
+        stats = self.entries.stats()
+        stats.update(file_hits=self.file_hits, file_misses=self.file_misses)
+        return stats
+
+    def clear(self):
+        """Remove all the entries, in memory and in the file"""
+        self.entries.clear()
+
+        if self._store is not None:
+            with self._lock:
+                self._store.clear()
+
+    def close(self):
+        if self._store is not None:
+            with self._lock:
+                self._store.close()
+                self._store = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _storeKey(self, key):
+        import hashlib
+        return hashlib.sha1(self._parameters_hash + repr(key).encode('utf-8')).hexdigest()
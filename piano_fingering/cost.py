@@ -5,12 +5,26 @@
 #
 # Use it by calling:
 #
-#    right_hand_cost_database, left_hand_cost_database = createCostDatabase()
+#    right_hand_cost_table, left_hand_cost_table = createCostTables()
 #
 # This will compute a cost table for all possible moves in the right and
-# left hands
+# left hands. The cost of a move is retrieved with:
+#
+#    right_hand_cost_table.cost(note1, note2, finger1, finger2)
+#
+# 'createCostDatabase()' returns the same tables, wrapped in read-only
+# dictionary views indexed by strings like '48,50,1,2'.
+#
+# The colors of the keys are symmetric around D (and G#), and the rules of the
+# left hand are the ones of the right hand with the directions reversed: apart
+# from the repeated notes, the cost of a move of the left hand is the cost of
+# the reflected move of the right hand. So only the table of the right hand is
+# computed and stored (see 'MirroredCostTable').
 
 
+from array import array
+from collections.abc import Mapping
+from collections.abc import Sequence
 import math
 
 
@@ -167,26 +181,295 @@ FINGER_STRETCH = {
 #----------------------------------------------------------
 
 
-def createCostDatabase():
-    right_hand_cost_database = {}
-    left_hand_cost_database = {}
+LOWEST_NOTE = 21       # in MIDI land, note 21 is actually the lowest
+HIGHEST_NOTE = 108     # note on the piano, and 108 is the highest
 
-    for finger1 in range(1, 6):
-        for note1 in range(21, 109):    # in MIDI land, note 21 is actually the lowest
-                                        # note on the piano, and 108 is the highest
-            for finger2 in range(1, 6):
-                for note2 in range(21, 109):
-                    computeRightHandCost(note1, note2, finger1, finger2, right_hand_cost_database)
-                    computeLeftHandCost(note1, note2, finger1, finger2, left_hand_cost_database)
+NB_FINGERS = 5
 
-    return right_hand_cost_database, left_hand_cost_database
+# Reflecting a note around D (or G#): MIRROR_NOTES - note
+MIRROR_NOTES = 4
 
 
 #----------------------------------------------------------
 
 
-def computeRightHandCost(n1, n2, f1, f2, cost_database):
-    key = '%d,%d,%d,%d' % (n1, n2, f1, f2)
+def maxTableInterval():
+    """Return the largest interval (in semitones) for which the cost of a move
+    isn't given by the tail of the move formulas (see 'moveTail()')
+
+    Past it, every rule ends up in 'ascMoveFormula()' or 'descMoveFormula()'
+    with a total distance above the last entry of MOVE_HASH, where the cost only
+    depends on the distance and on the fingers.
+    """
+    max_finger_distance = max(FINGER_DISTANCE.values())
+
+    return int(math.ceil(max(max(MOVE_HASH),
+                             MOVE_CUTOFF * max(FINGER_STRETCH.values()),
+                             10 * max(max(ASC_THUMB_STRETCH_VALS.values()),
+                                      max(DESC_THUMB_STRETCH_VALS.values()))) +
+                         max_finger_distance))
+
+
+def moveTail(total_distance):
+    """Cost of a move formula past the last entry of MOVE_HASH"""
+    longest_move = max(MOVE_HASH)
+    return MOVE_HASH[longest_move] + (total_distance - longest_move) / 5
+
+
+#----------------------------------------------------------
+
+
+class CostTable(object):
+    """Table of the costs of all the possible moves of one hand
+
+    All the cost rules only depend on the interval between the notes, on the
+    colors of their keys and on the fingers. So the costs are stored in a flat
+    array of doubles indexed by [pitch class of note1, interval, finger1, finger2],
+    for intervals between -max_interval and max_interval. Larger intervals are
+    computed from the tail of the move formulas, using the finger distance
+    (positive or negative) stored in 'tail_offsets' for each [descending, finger1,
+    finger2].
+
+    Use 'cost()' to retrieve the cost of a move, or 'index()' to retrieve its
+    position in 'values' when the interval is in the table.
+    """
+
+    def __init__(self, values, tail_offsets, max_interval):
+        self.values = values
+        self.tail_offsets = tail_offsets
+        self.max_interval = max_interval
+        self.nb_intervals = 2 * max_interval + 1
+
+    def index(self, n1, n2, f1, f2):
+        interval = n2 - n1
+        if not ((-self.max_interval <= interval <= self.max_interval) and
+                (1 <= f1 <= NB_FINGERS) and (1 <= f2 <= NB_FINGERS)):
+            raise KeyError('%d,%d,%d,%d' % (n1, n2, f1, f2))
+
+        return (((n1 % 12) * self.nb_intervals + interval + self.max_interval) * NB_FINGERS +
+                f1 - 1) * NB_FINGERS + f2 - 1
+
+    def cost(self, n1, n2, f1, f2):
+        interval = n2 - n1
+
+        if -self.max_interval <= interval <= self.max_interval:
+            return self.values[self.index(n1, n2, f1, f2)]
+
+        if not ((1 <= f1 <= NB_FINGERS) and (1 <= f2 <= NB_FINGERS)):
+            raise KeyError('%d,%d,%d,%d' % (n1, n2, f1, f2))
+
+        offset = self.tail_offsets[((interval < 0) * NB_FINGERS + f1 - 1) * NB_FINGERS + f2 - 1]
+        return moveTail(math.ceil(abs(interval) + offset))
+
+    def __len__(self):
+        return len(self.values)
+
+
+def createCostTable(left_or_right):
+    """Compute the table of the costs of all possible moves for the provided
+    hand ('left' or 'right')
+    """
+    if left_or_right == 'left':
+        costFunction = leftHandCost
+    else:
+        costFunction = rightHandCost
+
+    max_interval = maxTableInterval()
+    fingers = range(1, NB_FINGERS + 1)
+
+    # Moves with the same interval and key colors have the same costs, no need
+    # to compute them for each pitch class
+    blocks = {}
+    values = array('d')
+
+    for pitch_class in range(0, 12):
+        for interval in range(-max_interval, max_interval + 1):
+            colors = (COLOR[pitch_class], COLOR[(pitch_class + interval) % 12], interval)
+
+            block = blocks.get(colors)
+            if block is None:
+                n1 = 60 + pitch_class
+                n2 = n1 + interval
+                block = [ costFunction(n1, n2, f1, f2) for f1 in fingers for f2 in fingers ]
+                blocks[colors] = block
+
+            values.extend(block)
+
+    # Past 'max_interval', the only difference between the rules is whether they
+    # add or subtract the finger distance: find it by looking at the cost of a
+    # move that can't be mistaken for the other case
+    tail_offsets = array('d')
+    interval = max_interval + 1
+
+    for descending in (False, True):
+        for f1 in fingers:
+            for f2 in fingers:
+                finger_distance = fingerDistance(f1, f2)
+                cost = costFunction(60 + interval, 60, f1, f2) if descending else \
+                       costFunction(60, 60 + interval, f1, f2)
+
+                if cost == moveTail(math.ceil(interval + finger_distance)):
+                    tail_offsets.append(finger_distance)
+                else:
+                    tail_offsets.append(-finger_distance)
+
+    return CostTable(values, tail_offsets, max_interval)
+
+
+class MirroredCostTable(object):
+    """Table of the costs of all the possible moves of the left hand, using the
+    table of the right hand
+
+    The cost of a move is the one of the move of the right hand between the
+    reflected notes (see 'MIRROR_NOTES'), except for the repeated notes, whose
+    costs are stored in 'unisons', indexed by [pitch class, finger1, finger2].
+
+    Like in the original tables of the left hand, the fingers can be negative.
+
+    Like with 'CostTable', 'index()' returns the position of a move in 'values'
+    when the interval is in the table: 'values' is a read-only sequence of the
+    values of the table of the right hand, followed by the unisons.
+    """
+
+    def __init__(self, table, unisons):
+        self.table = table
+        self.unisons = unisons
+        self.max_interval = table.max_interval
+        self.nb_intervals = table.nb_intervals
+        self.values = MirroredValues(table.values, unisons)
+
+    def index(self, n1, n2, f1, f2):
+        finger1 = abs(f1)
+        finger2 = abs(f2)
+
+        if (n1 == n2) and (1 <= finger1 <= NB_FINGERS) and (1 <= finger2 <= NB_FINGERS):
+            return len(self.table.values) + \
+                   ((n1 % 12) * NB_FINGERS + finger1 - 1) * NB_FINGERS + finger2 - 1
+
+        try:
+            return self.table.index(MIRROR_NOTES - n1, MIRROR_NOTES - n2, finger1, finger2)
+        except KeyError:
+            # Report the move of the caller, not the reflected one
+            raise KeyError('%d,%d,%d,%d' % (n1, n2, f1, f2)) from None
+
+    def cost(self, n1, n2, f1, f2):
+        finger1 = abs(f1)
+        finger2 = abs(f2)
+
+        if (n1 == n2) and (1 <= finger1 <= NB_FINGERS) and (1 <= finger2 <= NB_FINGERS):
+            return self.unisons[((n1 % 12) * NB_FINGERS + finger1 - 1) * NB_FINGERS + finger2 - 1]
+
+        try:
+            return self.table.cost(MIRROR_NOTES - n1, MIRROR_NOTES - n2, finger1, finger2)
+        except KeyError:
+            raise KeyError('%d,%d,%d,%d' % (n1, n2, f1, f2)) from None
+
+    def __len__(self):
+        return len(self.values)
+
+
+class MirroredValues(Sequence):
+    """Read-only concatenation of the values of the table of the right hand and
+    of the unisons (see 'MirroredCostTable'), without any copy
+    """
+
+    def __init__(self, values, unisons):
+        self.values = values
+        self.unisons = unisons
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [ self[i] for i in range(*index.indices(len(self))) ]
+
+        if index < 0:
+            index += len(self)
+
+        if 0 <= index < len(self.values):
+            return self.values[index]
+
+        return self.unisons[index - len(self.values)]
+
+    def __len__(self):
+        return len(self.values) + len(self.unisons)
+
+
+def createMirroredCostTable(right_hand_cost_table):
+    """Return the table of the costs of the left hand, using the provided table
+    of the right hand (see 'MirroredCostTable')
+    """
+    unisons = array('d')
+
+    for pitch_class in range(0, 12):
+        for f1 in range(1, NB_FINGERS + 1):
+            for f2 in range(1, NB_FINGERS + 1):
+                unisons.append(leftHandCost(60 + pitch_class, 60 + pitch_class, f1, f2))
+
+    return MirroredCostTable(right_hand_cost_table, unisons)
+
+
+def createCostTables():
+    """Compute the cost tables of the right and left hands
+
+    The table of the left hand uses the one of the right hand (see
+    'MirroredCostTable').
+    """
+    right_hand_cost_table = createCostTable('right')
+    return right_hand_cost_table, createMirroredCostTable(right_hand_cost_table)
+
+
+#----------------------------------------------------------
+
+
+class CostDatabase(Mapping):
+    """Read-only dictionary view of a cost table, indexed by strings like
+    '48,50,1,2' (note1, note2, finger1, finger2)
+
+    Kept for compatibility with the code using the dictionaries returned
+    by previous versions of 'createCostDatabase()'. Lookups are done in the
+    underlying table, so no dictionary is ever built. Like in those dictionaries,
+    the fingers are between 1 and 5 (the callers use the absolute values of the
+    negative fingers of the left hand).
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def __getitem__(self, key):
+        try:
+            n1, n2, f1, f2 = [ int(x) for x in key.split(',') ]
+        except (AttributeError, ValueError):
+            raise KeyError(key)
+
+        if not ((LOWEST_NOTE <= n1 <= HIGHEST_NOTE) and (LOWEST_NOTE <= n2 <= HIGHEST_NOTE) and
+                (1 <= f1 <= NB_FINGERS) and (1 <= f2 <= NB_FINGERS)):
+            raise KeyError(key)
+
+        return self.table.cost(n1, n2, f1, f2)
+
+    def __iter__(self):
+        for finger1 in range(1, NB_FINGERS + 1):
+            for note1 in range(LOWEST_NOTE, HIGHEST_NOTE + 1):
+                for finger2 in range(1, NB_FINGERS + 1):
+                    for note2 in range(LOWEST_NOTE, HIGHEST_NOTE + 1):
+                        yield '%d,%d,%d,%d' % (note1, note2, finger1, finger2)
+
+    def __len__(self):
+        nb_notes = HIGHEST_NOTE - LOWEST_NOTE + 1
+        return NB_FINGERS * nb_notes * NB_FINGERS * nb_notes
+
+
+def createCostDatabase():
+    right_hand_cost_table, left_hand_cost_table = createCostTables()
+    return CostDatabase(right_hand_cost_table), CostDatabase(left_hand_cost_table)
+
+
+#----------------------------------------------------------
+
+
+def rightHandCost(n1, n2, f1, f2):
+    """Return the cost of moving from note n1 with finger f1 to note n2 with finger f2
+    with the right hand
+    """
     note_distance = abs(n2 - n1)
     finger_distance = fingerDistance(f1, f2)
 
@@ -194,29 +477,29 @@ def computeRightHandCost(n1, n2, f1, f2, cost_database):
     # finger. It doesn't matter whether we send it to ascMoveFormula or descMoveFormula,
     # since in either case, finger_distance is zero.
     if (note_distance > 0) and (f2 - f1 == 0):
-        cost_database[key] = ascMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
+        return ascMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
 
     # Handles ascending notes and descending fingers, but f2 isn't thumb.
     # It means you're crossing over. Bad idea. Only plausible way to do this is picking
     # your hand up. Thus move formula
     elif (n2 - n1 >= 0) and (f2 - f1 < 0) and (f2 != 1):
-        cost_database[key] = ascMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
+        return ascMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
 
     # This handles descending notes with ascending fingers where f1 isn't thumb.
     # It means your crossing over. Same as above. Only plausible way is picking hand up,
     # so move formula.
     elif (n2 - n1 < 0) and (f2 - f1 > 0) and (f1 != 1):
-        cost_database[key] = ascMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
+        return ascMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
 
     # This handles ascending notes, where you start on a finger that isn't your thumb,
     # but you land on your thumb, thus bringing your thumb under.
     elif (n2 - n1 >= 0) and (f2 - f1 < 0) and (f2 == 1):
-        cost_database[key] = ascThumbCost(note_distance, finger_distance, n1, n2, f1, f2)
+        return ascThumbCost(note_distance, finger_distance, n1, n2, f1, f2)
 
     # This handles descending notes, where you start on your thumb, but don't end with it.
     # Thus your crossing over your thumb.
     elif (n2 - n1 < 0) and (f1 == 1) and (f2 != 1):
-        cost_database[key] = descThumbCost(note_distance, finger_distance, n1, n2, f1, f2)
+        return descThumbCost(note_distance, finger_distance, n1, n2, f1, f2)
 
     # This handles ascending or same note, with ascending or same finger.
     # To be clear... only remaining options are ((n2 - n1 >= 0) and (f2 - f1 > 0)) or
@@ -225,16 +508,18 @@ def computeRightHandCost(n1, n2, f1, f2, cost_database):
         stretch = fingerStretch(f1, f2)
         x = abs(note_distance - finger_distance) / stretch
         if x > MOVE_CUTOFF:
-            cost_database[key] = descMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
+            return descMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
         else:
-            cost_database[key] = ascDescNoCrossCost(note_distance, finger_distance, x, n1, n2, f1, f2)
+            return ascDescNoCrossCost(note_distance, finger_distance, x, n1, n2, f1, f2)
 
 
 #----------------------------------------------------------
 
 
-def computeLeftHandCost(n1, n2, f1, f2, cost_database):
-    key = '%d,%d,%d,%d' % (n1, n2, f1, f2)
+def leftHandCost(n1, n2, f1, f2):
+    """Return the cost of moving from note n1 with finger f1 to note n2 with finger f2
+    with the left hand
+    """
     note_distance = abs(n2 - n1)
     finger_distance = fingerDistance(f1, f2)
 
@@ -242,29 +527,29 @@ def computeLeftHandCost(n1, n2, f1, f2, cost_database):
     # finger. It doesn't matter whether we send it to ascMoveFormula or descMoveFormula,
     # since in either case, finger_distance is zero.
     if (note_distance > 0) and (f2 - f1 == 0):
-        cost_database[key] = ascMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
+        return ascMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
 
     # Handles descending notes and descending fingers, but f2 isn't thumb.
     # It means you're crossing over. Bad idea. Only plausible way to do this is picking
     # your hand up. Thus move formula
     elif (n2 - n1 <= 0) and (f2 - f1 < 0) and (f2 != 1):
-        cost_database[key] = ascMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
+        return ascMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
 
     # This handles ascending notes with ascending fingers where f1 isn't thumb.
     # It means your crossing over. Same as above. Only plausible way is picking hand up,
     # so move formula.
     elif (n2 - n1 > 0) and (f2 - f1 > 0) and (f1 != 1):
-        cost_database[key] = ascMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
+        return ascMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
 
     # This handles descending notes, where you start on a finger that isn't your thumb,
     # but you land on your thumb, thus bringing your thumb under.
     elif (n2 - n1 <= 0) and (f2 - f1 < 0) and (f2 == 1):
-        cost_database[key] = ascThumbCost(note_distance, finger_distance, n1, n2, f1, f2)
+        return ascThumbCost(note_distance, finger_distance, n1, n2, f1, f2)
 
     # This handles ascending notes, where you start on your thumb, but don't end with it.
     # Thus your crossing over your thumb.
     elif (n2 - n1 >= 0) and (f1 == 1) and (f2 != 1):
-        cost_database[key] = descThumbCost(note_distance, finger_distance, n1, n2, f1, f2)
+        return descThumbCost(note_distance, finger_distance, n1, n2, f1, f2)
 
     # This handles ascending or same note, with descending fingers or it takes
     # descending notes with ascending fingers.
@@ -274,13 +559,27 @@ def computeLeftHandCost(n1, n2, f1, f2, cost_database):
         stretch = fingerStretch(f1, f2)
         x = abs(note_distance - finger_distance) / stretch
         if x > MOVE_CUTOFF:
-            cost_database[key] = descMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
+            return descMoveFormula(note_distance, finger_distance, n1, n2, f1, f2)
         else:
-            cost_database[key] = ascDescNoCrossCost(note_distance, finger_distance, x, n1, n2, f1, f2)
+            return ascDescNoCrossCost(note_distance, finger_distance, x, n1, n2, f1, f2)
+
+
+#----------------------------------------------------------
+
+
+def computeRightHandCost(n1, n2, f1, f2, cost_database):
+    cost_database['%d,%d,%d,%d' % (n1, n2, f1, f2)] = rightHandCost(n1, n2, f1, f2)
+
+
+#----------------------------------------------------------
+
+
+def computeLeftHandCost(n1, n2, f1, f2, cost_database):
+    cost_database['%d,%d,%d,%d' % (n1, n2, f1, f2)] = leftHandCost(n1, n2, f1, f2)
 
 
 #----------------------------------------------------------
-    
+
 
 def fingerDistance(f1, f2):
     """Currently assumes your on Middle C. Could potentially take into account n1 as
@@ -431,28 +730,32 @@ def descThumbCost(note_distance, finger_distance, n1, n2, f1, f2):
 #----------------------------------------------------------
 
 
-def ascDescNoCrossCost(note_distance, finger_distance, x, n1, n2, f1, f2):
-    def costFunc(x):
-        return -0.0000006589793725 * math.pow(x, 10) - \
-               0.000002336381414 * math.pow(x, 9) + \
-               0.00009925769823 * math.pow(x, 8) + \
-               0.0001763353131 * math.pow(x, 7) - \
-               0.004660305277 * math.pow(x, 6) - \
-               0.004290746384 * math.pow(x, 5) + \
-               0.06855725903 * math.pow(x, 4) + \
-               0.03719817227 * math.pow(x, 3) + \
-               0.4554696705 * math.pow(x, 2) - \
-               0.08305450359 * x + \
-               0.3020594956
+def noCrossCostFunc(x):
+    return -0.0000006589793725 * math.pow(x, 10) - \
+           0.000002336381414 * math.pow(x, 9) + \
+           0.00009925769823 * math.pow(x, 8) + \
+           0.0001763353131 * math.pow(x, 7) - \
+           0.004660305277 * math.pow(x, 6) - \
+           0.004290746384 * math.pow(x, 5) + \
+           0.06855725903 * math.pow(x, 4) + \
+           0.03719817227 * math.pow(x, 3) + \
+           0.4554696705 * math.pow(x, 2) - \
+           0.08305450359 * x + \
+           0.3020594956
 
+
+#----------------------------------------------------------
+
+
+def ascDescNoCrossCost(note_distance, finger_distance, x, n1, n2, f1, f2):
     # If it's above 6.8, but below moveCutoff, then we use an additional formula
     # because the current one has an odd shape to it where it goes sharply negative
     # after 6.8  I know this appears janky, but after messing with other potential
     # regression formulas, I can't get any single one to match both the overall shape,
     # and certainly specific Y values I want. So this seems like best option.
     if (x > 6.8) and (x <= MOVE_CUTOFF):
-        return costFunc(6.8) + (x - 6.8) * 3
+        return noCrossCostFunc(6.8) + (x - 6.8) * 3
     else:
-      cost = costFunc(x)
+      cost = noCrossCostFunc(x)
       cost += colorRules(n1, n2, f1, f2, finger_distance)
       return cost
@@ -31,13 +31,24 @@
 from collections import namedtuple
 from copy import copy
 import math
-from .cost import createCostDatabase
+import threading
+from .cache import LRUCache
+from .cache import transitionKey
+from .cost import COLOR
+from .cost import CostDatabase
+from .storage import loadOrCreateCostTables
 
 
 #----------------------------------------------------------
 
 
-RIGHT_HAND_COST_DATABASE, LEFT_HAND_COST_DATABASE = createCostDatabase()
+# The cost tables and finger options are built by 'warmup()', either explicitly
+# or on the first call to 'computeFingering()', to keep the import of the
+# module cheap
+COST_TABLES = {}
+FINGER_OPTIONS = {}
+
+_warmup_lock = threading.Lock()
 
 
 NotesInfo = namedtuple('NotesInfo', ['notes', 'fingers'])
@@ -46,11 +57,38 @@ NotesInfo = namedtuple('NotesInfo', ['notes', 'fingers'])
 #----------------------------------------------------------
 
 
-def computeFingering(notes, left_or_right):
+def computeFingering(notes, left_or_right, engine='python', memory='full', workers=1,
+                     beam=None, margin=None):
     """Compute the best fingering for the provided list of MIDI notes
 
     'left_or_right' must be either 'left' or 'right'.
 
+    'engine' selects the implementation of the algorithm: 'python' (the default),
+    'numpy' (much faster on long lists of notes, but requires numpy), or
+    'branch_and_bound' (skips the transitions that can't be on the best path, see
+    'search.py'). All produce exactly the same results.
+
+    'memory' selects how the best previous nodes of each layer are kept until the
+    best path is walked backward. All the modes produce exactly the same results:
+
+      - 'full' (the default): one list (or array) of indices per layer
+      - 'compact': one string of bytes per layer, about 3 times smaller, for a
+        small slowdown
+      - 'checkpoints': only the scores of one layer every sqrt(n) layers are kept,
+        the best previous nodes are computed again one segment at a time while
+        walking backward. The memory used by the algorithm grows with sqrt(n)
+        instead of n, for about twice the computation time
+
+    'workers' is the number of processes used to compute the fingering (None for
+    the number of processors). The notes are split in ranges computed in
+    parallel (see 'parallel.py'). The results can only differ from the sequential
+    ones between fingerings whose costs are equal up to the rounding. When the
+    notes are split, 'checkpoints' is replaced by 'compact', with a RuntimeWarning.
+
+    'beam' and 'margin' enable an approximate (but faster) mode: after each note,
+    only the 'beam' best fingerings, and the ones whose score is less than
+    'margin' above the best one, are kept. See 'beamDivergence()' to choose them.
+
     The elements of the list of MIDI notes can have the following formats:
 
       - A single note: 60
@@ -68,51 +106,280 @@ def computeFingering(notes, left_or_right):
     """
     notes, rests = preprocessNotes(notes)
 
-    layers = [ [Node([], [])] ]
+    if (beam is not None) and (beam < 1):
+        raise ValueError('Invalid beam: %d' % beam)
+
+    if (margin is not None) and (margin < 0):
+        raise ValueError('Invalid margin: %s' % margin)
+
+    if workers != 1:
+        from .parallel import computeBestPath as computeBestPathParallel
+        result = computeBestPathParallel(notes, left_or_right, engine, memory, workers,
+                                         beam=beam, margin=margin)
+    elif engine == 'python':
+        result = computeBestPath(notes, left_or_right, memory, beam=beam, margin=margin)
+    elif engine == 'numpy':
+        from .vectorized import computeBestPath as computeBestPathVectorized
+        result = computeBestPathVectorized(notes, left_or_right, memory, beam=beam, margin=margin)
+    elif engine == 'branch_and_bound':
+        from .search import computeBestPath as computeBestPathSearch
+        result = computeBestPathSearch(notes, left_or_right, memory, beam=beam, margin=margin)
+    else:
+        raise ValueError("Unknown engine: '%s'" % engine)
 
-    for infos in notes:
-        layers.append(makeLayer(infos.notes, left_or_right, infos.fingers))
+    return insertRests(result, rests)
+
+
+def pathCost(fingered_notes, left_or_right):
+    """Return the total cost of a fingering, in the format returned by
+    'computeFingering()'
+    """
+    total_cost = 0
+
+    previous = dict(notes=[], fingers=[])
+    for entry in fingered_notes:
+        if len(entry['notes']) == 0:
+            continue
+
+        total_cost += transitionCost(previous['notes'], previous['fingers'], entry['notes'],
+                                     entry['fingers'], left_or_right) + \
+                      calcStateCost(entry['notes'], entry['fingers'], left_or_right)
+        previous = entry
+
+    return total_cost
+
+
+def beamDivergence(corpus, left_or_right, beam=None, margin=None, engine='python'):
+    """Compare the results of 'computeFingering()' with the provided 'beam' and
+    'margin' to the exact ones, on a corpus (list of lists of MIDI notes)
+
+    Returns a dictionary with:
+
+      - 'pieces': the number of lists of notes in the corpus
+      - 'diverged_pieces': the number of them with a different fingering
+      - 'notes': the number of notes and chords in the corpus (rests excluded)
+      - 'diverged_notes': the number of them with a different fingering
+      - 'cost_increase': the mean relative increase of the cost of the
+        fingerings (see 'pathCost()')
+    """
+    report = dict(pieces=0, diverged_pieces=0, notes=0, diverged_notes=0, cost_increase=0.0)
+
+    for notes in corpus:
+        expected = computeFingering(notes, left_or_right, engine=engine)
+        result = computeFingering(notes, left_or_right, engine=engine, beam=beam, margin=margin)
+
+        nb_diverged_notes = len([ entry for entry, expected_entry in zip(result, expected)
+                                  if (entry != expected_entry) ])
+
+        report['pieces'] += 1
+        report['notes'] += len([ entry for entry in expected if len(entry['notes']) > 0 ])
+
+        if nb_diverged_notes > 0:
+            report['diverged_pieces'] += 1
+            report['diverged_notes'] += nb_diverged_notes
+
+            expected_cost = pathCost(expected, left_or_right)
+            if expected_cost > 0:
+                report['cost_increase'] += (pathCost(result, left_or_right) - expected_cost) / expected_cost
+
+    if report['pieces'] > 0:
+        report['cost_increase'] /= report['pieces']
+
+    return report
+
+
+#----------------------------------------------------------
+
+
+def computeBestPath(notes, left_or_right, memory='full', beam=None, margin=None):
+    """Compute the best fingering for the provided list of NotesInfo (see
+    'preprocessNotes()'), without rests
+
+    The nodes of each layer are only represented by their index in the list of
+    fingering options of the layer: the scores of the nodes of the last layer
+    and, for each layer, the indices of the best previous nodes are kept.
+    """
+    return findBestPath(notes, left_or_right, relaxLayers, memory, beam=beam, margin=margin)
+
+
+def relaxLayers(notes, left_or_right, scores, previous_infos, backpointers=None, compact=False,
+                beam=None, margin=None, relative=False):
+    """Compute the scores of the nodes of the layers of the provided list of
+    NotesInfo, starting from the scores of the nodes of the layer of
+    'previous_infos', and return the scores of the nodes of the last layer
+
+    If 'backpointers' is a list, the indices of the best previous nodes of each
+    layer are appended to it (as bytes if 'compact' is True).
+
+    See 'pruneScores()' for 'beam' and 'margin'.
+
+    If 'relative' is True, the scores of each layer are made relative to the best
+    one: the scores of the layers with only one node are then always 0, whatever
+    precedes them, which allows to compute parts of the list independently (see
+    'parallel.py' and 'session.py'). Since the sums are rounded differently, the
+    best path may then differ from the one found with the total scores, but only
+    between paths whose costs are equal up to the rounding.
+    """
+    pruning = (beam is not None) or (margin is not None)
 
     # Go through each layer
-    for layer_index in range(1, len(layers)):
+    for infos in notes:
 
-        # Go through each node in the layer
-        for current_node in layers[layer_index]:
-            min_score = float('inf')
+        # Go through each node in the layer, and find the best node of the
+        # previous layer (the first one in case of equality)
+        best_previous_nodes = []
+        current_scores = []
 
-            # Go through each node in the previous layer
-            for previous_node in layers[layer_index - 1]:
-                total_cost = previous_node.score
+        if not pruning:
+            matrix = transitionMatrix(previous_infos.notes, previous_infos.fingers,
+                                      infos.notes, infos.fingers, left_or_right)
 
-                cost = calcCost(current_node, previous_node, left_or_right)
+            for costs in matrix:
+                totals = [ score + cost for score, cost in zip(scores, costs) ]
+                min_score = min(totals)
 
-                total_cost += cost
+                best_previous_nodes.append(totals.index(min_score))
+                current_scores.append(min_score)
+        else:
+            # Only consider the nodes of the previous layer that were kept
+            previous_nodes = [ i for i, score in enumerate(scores) if score != INFINITY ]
+            previous_scores = [ scores[i] for i in previous_nodes ]
+
+            matrix = partialTransitionMatrix(previous_infos.notes, previous_infos.fingers,
+                                             previous_nodes, infos.notes, infos.fingers,
+                                             left_or_right)
+
+            for costs in matrix:
+                totals = [ score + cost for score, cost in zip(previous_scores, costs) ]
+                min_score = min(totals)
+
+                best_previous_nodes.append(previous_nodes[totals.index(min_score)])
+                current_scores.append(min_score)
+
+        if backpointers is not None:
+            backpointers.append(bytes(best_previous_nodes) if compact else best_previous_nodes)
+
+        if relative:
+            best_score = min(current_scores)
+            scores = [ score - best_score for score in current_scores ]
+        else:
+            scores = current_scores
+
+        if pruning:
+            scores = pruneScores(scores, beam, margin)
+
+        previous_infos = infos
+
+    return scores
+
+
+INFINITY = float('inf')
+
+
+def pruneScores(scores, beam, margin):
+    """Return the provided list of scores, with the ones of the nodes to discard
+    replaced by infinity
+
+    Only the 'beam' best nodes (the first ones in case of equality) are kept, and
+    only if their score is at most 'margin' above the best one. None disables each
+    criteria.
+    """
+    kept = range(0, len(scores))
+    if (beam is not None) and (len(scores) > beam):
+        kept = set(sorted(kept, key=scores.__getitem__)[:beam])
+
+    if margin is not None:
+        margin += min(scores)
+
+    return [ score if (i in kept) and ((margin is None) or (score <= margin)) else INFINITY
+             for i, score in enumerate(scores) ]
+
+
+#----------------------------------------------------------
 
-                if total_cost < min_score:
-                    min_score = total_cost
-                    current_node.score = total_cost
-                    current_node.best_previous_node = previous_node
 
-    # Find the best final node
-    best_node = layers[-1][0]
-    for node in layers[-1][1:]:
-        if node.score < best_node.score:
-            best_node = node
+MEMORY_MODES = ('full', 'compact', 'checkpoints')
 
-    # Walk the nodes backward to construct the best path
+
+def findBestPath(notes, left_or_right, relaxLayers, memory='full', first_infos=None,
+                 beam=None, margin=None, relative=False):
+    """Compute the best fingering for the provided list of NotesInfo, using the
+    provided implementation of 'relaxLayers()'
+
+    See 'computeFingering()' for a description of the memory modes.
+
+    'first_infos' is the NotesInfo preceding the list, whose layer must only have
+    one node. By default, the first layer is preceded by an empty node.
+
+    'beam', 'margin' and 'relative' are given to 'relaxLayers()'.
+    """
+    if memory not in MEMORY_MODES:
+        raise ValueError("Unknown memory mode: '%s'" % memory)
+
+    if len(notes) == 0:
+        return []
+
+    if first_infos is None:
+        first_infos = NotesInfo(notes=[], fingers=None)
+
+    if memory != 'checkpoints':
+        backpointers = []
+        scores = relaxLayers(notes, left_or_right, [ 0 ], first_infos, backpointers,
+                             compact=(memory == 'compact'), beam=beam, margin=margin,
+                             relative=relative)
+
+        result = []
+        walkBackward(notes, backpointers, bestNode(scores), left_or_right, result)
+        result.reverse()
+        return result
+
+    # Only keep the scores at the start of each segment
+    segment_size = max(int(math.sqrt(len(notes))), 1)
+    checkpoints = []
+
+    scores = [ 0 ]
+    for start in range(0, len(notes), segment_size):
+        checkpoints.append(scores)
+        scores = relaxLayers(notes[start:start + segment_size], left_or_right, scores,
+                             notes[start - 1] if start > 0 else first_infos, beam=beam, margin=margin,
+                             relative=relative)
+
+    # Compute the best previous nodes again, one segment at a time, from the end
+    best_node = bestNode(scores)
     result = []
-    while best_node is not None:
-        result.insert(0, dict(notes=best_node.notes, fingers=best_node.fingers))
-        best_node = best_node.best_previous_node
 
-    result = result[1:]
+    for start, scores in zip(reversed(range(0, len(notes), segment_size)), reversed(checkpoints)):
+        segment = notes[start:start + segment_size]
+
+        backpointers = []
+        relaxLayers(segment, left_or_right, scores, notes[start - 1] if start > 0 else first_infos,
+                    backpointers, beam=beam, margin=margin, relative=relative)
 
-    for rest in rests:
-        result.insert(rest, dict(notes=[], fingers=[]))
+        best_node = walkBackward(segment, backpointers, best_node, left_or_right, result)
+
+    result.reverse()
 
     return result
 
 
+def bestNode(scores):
+    """Return the index of the best score (the first one in case of equality)"""
+    return min(range(0, len(scores)), key=scores.__getitem__)
+
+
+def walkBackward(notes, backpointers, best_node, left_or_right, result):
+    """Walk the nodes of the layers backward from the provided best node of the last
+    layer, appending the fingered notes to 'result' (in reverse order), and return
+    the best node of the layer preceding the first one
+    """
+    for infos, best_previous_nodes in zip(reversed(notes), reversed(backpointers)):
+        options = layerOptions(infos.notes, infos.fingers, left_or_right)
+        result.append(dict(notes=infos.notes, fingers=options[best_node]))
+        best_node = int(best_previous_nodes[best_node])
+
+    return best_node
+
+
 #----------------------------------------------------------
 
 
@@ -138,16 +405,77 @@ def getAllFingerOptions(nb_fingers, left_or_right):
     return results
 
 
-# Initialize finger options object
-ALL_FINGER_OPTIONS_RIGHT = {}
-ALL_FINGER_OPTIONS_LEFT = {}
+#----------------------------------------------------------
+
+
+def warmup():
+    """Build the cost tables and finger options used by 'computeFingering()'
+
+    This is done automatically on the first call to 'computeFingering()'. Long-running
+    services can call this function at startup to pay that cost up front.
+
+    The cost tables are loaded from the cache directory if possible (see
+    'storage.loadOrCreateCostTables()').
+    """
+    with _warmup_lock:
+        if not FINGER_OPTIONS:
+            finger_options = {}
+            for left_or_right in ('right', 'left'):
+                finger_options[left_or_right] = {}
+                for i in range(1, 6):
+                    finger_options[left_or_right][i] = getAllFingerOptions(i, left_or_right)
+                    finger_options[left_or_right][i].sort()
+
+            FINGER_OPTIONS.update(finger_options)
+
+        if not COST_TABLES:
+            right_hand_cost_table, left_hand_cost_table = loadOrCreateCostTables()
+            COST_TABLES.update(right=right_hand_cost_table, left=left_hand_cost_table)
+            CHORD_STATE_COSTS.clear()
+            TRANSITION_MATRICES.clear()
+
+
+def useCostTables(right_hand_cost_table, left_hand_cost_table):
+    """Use the provided cost tables instead of the ones built by 'warmup()' (for
+    example, the ones published in shared memory by another process, see
+    'storage.attachCostTables()')
+    """
+    with _warmup_lock:
+        COST_TABLES.update(right=right_hand_cost_table, left=left_hand_cost_table)
+        CHORD_STATE_COSTS.clear()
+        TRANSITION_MATRICES.clear()
+
 
-for i in range(1, 6):
-    ALL_FINGER_OPTIONS_RIGHT[i] = getAllFingerOptions(i, 'right')
-    ALL_FINGER_OPTIONS_RIGHT[i].sort()
+def getCostTable(left_or_right):
+    if not COST_TABLES:
+        warmup()
 
-    ALL_FINGER_OPTIONS_LEFT[i] = getAllFingerOptions(i, 'left')
-    ALL_FINGER_OPTIONS_LEFT[i].sort()
+    return COST_TABLES['left' if left_or_right == 'left' else 'right']
+
+
+def getFingerOptions(nb_fingers, left_or_right):
+    if not FINGER_OPTIONS:
+        warmup()
+
+    return FINGER_OPTIONS['left' if left_or_right == 'left' else 'right'][nb_fingers]
+
+
+def __getattr__(name):
+    # Lazily built module attributes, kept for compatibility (Python 3.7+)
+    if name == 'RIGHT_HAND_COST_TABLE':
+        return getCostTable('right')
+    elif name == 'LEFT_HAND_COST_TABLE':
+        return getCostTable('left')
+    elif name == 'RIGHT_HAND_COST_DATABASE':
+        return CostDatabase(getCostTable('right'))
+    elif name == 'LEFT_HAND_COST_DATABASE':
+        return CostDatabase(getCostTable('left'))
+    elif name == 'ALL_FINGER_OPTIONS_RIGHT':
+        return dict([ (i, getFingerOptions(i, 'right')) for i in range(1, 6) ])
+    elif name == 'ALL_FINGER_OPTIONS_LEFT':
+        return dict([ (i, getFingerOptions(i, 'left')) for i in range(1, 6) ])
+
+    raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
 
 
 #----------------------------------------------------------
@@ -158,44 +486,83 @@ def preprocessNotes(notes):
     rests = []
 
     for index, entry in enumerate(notes):
-        if isinstance(entry, list):
-            if len(entry) > 0:
-                result.append(NotesInfo(notes=entry, fingers=None))
-            else:
-                rests.append(index)
-        elif isinstance(entry, dict):
-            result.append(NotesInfo(notes=entry['notes'], fingers=entry['fingers']))
+        infos = preprocessEntry(entry)
+        if infos is not None:
+            result.append(infos)
         else:
-            result.append(NotesInfo(notes=[entry], fingers=None))
+            rests.append(index)
 
     return result, rests
 
 
+def preprocessEntry(entry):
+    """Return the NotesInfo of an element of a list of MIDI notes (see
+    'computeFingering()'), or None if it is a rest
+    """
+    if isinstance(entry, list):
+        if len(entry) > 0:
+            return NotesInfo(notes=entry, fingers=None)
+        else:
+            return None
+    elif isinstance(entry, dict):
+        return NotesInfo(notes=entry['notes'], fingers=entry['fingers'])
+    else:
+        return NotesInfo(notes=[entry], fingers=None)
+
+
+def insertRests(result, rests):
+    """Return the list of fingered notes with the rests (indices returned by
+    'preprocessNotes()') inserted back
+    """
+    if len(rests) == 0:
+        return result
+
+    merged = []
+    entries = iter(result)
+    next_rest = 0
+
+    for index in range(0, len(result) + len(rests)):
+        if (next_rest < len(rests)) and (rests[next_rest] == index):
+            merged.append(dict(notes=[], fingers=[]))
+            next_rest += 1
+        else:
+            merged.append(next(entries))
+
+    return merged
+
+
 #----------------------------------------------------------
 
 
 class Node(object):
 
-    def __init__(self, notes, fingers):
+    __slots__ = ('notes', 'fingers', 'state_cost', 'score', 'best_previous_node')
+
+    def __init__(self, notes, fingers, state_cost=None):
         self.notes = notes
         self.fingers = fingers
+        self.state_cost = state_cost
         self.score = 0
         self.best_previous_node = None
 
 
+def layerOptions(notes, fingers, left_or_right):
+    """Return the possible fingerings of a layer: the ones imposed by the user, or
+    all the fingering options for that number of notes
+    """
+    if fingers is not None:
+        return [ fingers ]
+    elif len(notes) == 0:
+        return [ [] ]
+
+    return getFingerOptions(len(notes), left_or_right)
+
+
 def makeLayer(notes, left_or_right, fingers=None):
     layer = []
 
-    if fingers is not None:
-        layer.append(Node(notes, fingers))
-    else:
-        if left_or_right == 'right':
-            options = ALL_FINGER_OPTIONS_RIGHT[len(notes)]
-        else:
-            options = ALL_FINGER_OPTIONS_LEFT[len(notes)]
-
-        for option in options:
-            layer.append(Node(notes, option))
+    for option in layerOptions(notes, fingers, left_or_right):
+        layer.append(Node(notes, option, calcStateCost(notes, option, left_or_right)))
 
     return layer
 
@@ -204,47 +571,171 @@ def makeLayer(notes, left_or_right, fingers=None):
 
 
 def computeRightHandCost(n1, n2, f1, f2):
-    key = '%d,%d,%d,%d' % (n1, n2, f1, f2)
-    return RIGHT_HAND_COST_DATABASE[key]
+    return getCostTable('right').cost(n1, n2, f1, f2)
 
 
 #----------------------------------------------------------
 
 
 def computeLeftHandCost(n1, n2, f1, f2):
-    key = '%d,%d,%d,%d' % (n1, n2, abs(f1), abs(f2))
-    return LEFT_HAND_COST_DATABASE[key]
+    return getCostTable('left').cost(n1, n2, abs(f1), abs(f2))
 
 
 #----------------------------------------------------------
 
 
 def calcCost(current_node, previous_node, left_or_right):
-    if left_or_right == 'left':
-        costFunction = computeLeftHandCost
-    else:
-        costFunction = computeRightHandCost
+    """Return the cost of moving from the previous node to the current one: the
+    transition cost, plus the "state" cost of the current node
+    """
+    state_cost = current_node.state_cost
+    if state_cost is None:
+        state_cost = calcStateCost(current_node.notes, current_node.fingers, left_or_right)
+
+    return calcTransitionCost(current_node, previous_node, left_or_right) + state_cost
+
+
+#----------------------------------------------------------
+
+
+def calcTransitionCost(current_node, previous_node, left_or_right):
+    """Return the cost of moving each note of the previous node to each note of
+    the current node
+    """
+    return transitionCost(previous_node.notes, previous_node.fingers, current_node.notes,
+                          current_node.fingers, left_or_right)
+
+
+def transitionCost(previous_notes, previous_fingers, current_notes, current_fingers,
+                   left_or_right):
+    """Return the cost of moving each of the previous notes to each of the current
+    notes, with the provided fingers
+    """
+    cost = getCostTable(left_or_right).cost
 
     total_cost = 0
 
-    # Go through each note in the current node
-    for i in range(0, len(current_node.notes)):
-        current_note = current_node.notes[i]
-        current_finger = current_node.fingers[i]
-
-        # This helps add the "state" cost of actually using those fingers for
-        # that chord. This isn't captured by the transition costs
-        has_next_note = i < len(current_node.notes) - 1
-        if has_next_note:
-            next_note = current_node.notes[i + 1]
-            next_finger = current_node.fingers[i + 1]
-            total_cost += costFunction(current_note, next_note, current_finger, next_finger)
-
-        # Add up scores for each of the previous nodes notes trying to get to current node note
-        for j in range(0, len(previous_node.notes)):
-            previous_note = previous_node.notes[j]
-            previous_finger = previous_node.fingers[j]
-
-            total_cost += costFunction(previous_note, current_note, previous_finger, current_finger)
+    # Go through each current note
+    for i in range(0, len(current_notes)):
+        current_note = current_notes[i]
+        current_finger = current_fingers[i]
+
+        # Add up scores for each of the previous notes trying to get to current note
+        for j in range(0, len(previous_notes)):
+            total_cost += cost(previous_notes[j], current_note, previous_fingers[j], current_finger)
+
+    return total_cost
+
+
+#----------------------------------------------------------
+
+
+# Cache of the matrices of the costs between two layers, shared by the engines
+# (see 'cache.transitionKey()'). Its size can be changed with
+# 'TRANSITION_MATRICES.resize()', and 'TRANSITION_MATRICES.stats()' reports its
+# hit rate.
+TRANSITION_MATRICES = LRUCache(maxsize=4096)
+
+
+def transitionMatrix(previous_notes, previous_fingers, current_notes, current_fingers,
+                     left_or_right):
+    """Return the costs (see 'calcCost()') of moving from each fingering option of
+    the previous notes to each fingering option of the current notes, as one row
+    per option of the current notes
+
+    'previous_fingers' and 'current_fingers' are the fingers imposed by the user
+    for the notes, or None.
+    """
+    key = ('python', transitionKey(left_or_right, previous_notes, previous_fingers,
+                                   current_notes, current_fingers))
+
+    matrix = TRANSITION_MATRICES.get(key)
+    if matrix is None:
+        previous_options = layerOptions(previous_notes, previous_fingers, left_or_right)
+
+        matrix = []
+        for current_option in layerOptions(current_notes, current_fingers, left_or_right):
+            state_cost = calcStateCost(current_notes, current_option, left_or_right)
+            matrix.append([ transitionCost(previous_notes, previous_option, current_notes,
+                                           current_option, left_or_right) + state_cost
+                            for previous_option in previous_options ])
+
+        TRANSITION_MATRICES.put(key, matrix)
+
+    return matrix
+
+
+def partialTransitionMatrix(previous_notes, previous_fingers, previous_nodes, current_notes,
+                            current_fingers, left_or_right):
+    """Same as 'transitionMatrix()', but each row only contains the costs from the
+    provided nodes (indices of fingering options) of the previous notes
+
+    Only those costs are computed (and cached) if the whole matrix isn't in the
+    cache.
+    """
+    key = ('python', transitionKey(left_or_right, previous_notes, previous_fingers,
+                                   current_notes, current_fingers))
+
+    matrix = TRANSITION_MATRICES.get(key)
+    if matrix is not None:
+        return [ [ costs[i] for i in previous_nodes ] for costs in matrix ]
+
+    key = ('partial', key, tuple(previous_nodes))
+
+    matrix = TRANSITION_MATRICES.get(key)
+    if matrix is not None:
+        return matrix
+
+    previous_options = layerOptions(previous_notes, previous_fingers, left_or_right)
+
+    matrix = []
+    for current_option in layerOptions(current_notes, current_fingers, left_or_right):
+        state_cost = calcStateCost(current_notes, current_option, left_or_right)
+        matrix.append([ transitionCost(previous_notes, previous_options[i], current_notes,
+                                       current_option, left_or_right) + state_cost
+                        for i in previous_nodes ])
+
+    TRANSITION_MATRICES.put(key, matrix)
+
+    return matrix
+
+
+#----------------------------------------------------------
+
+
+# Cache of the "state" costs of the chords, indexed by hand, colors of the keys,
+# intervals and fingers
+CHORD_STATE_COSTS = {}
+MAX_CHORD_STATE_COSTS = 100000
+
+
+def calcStateCost(notes, fingers, left_or_right):
+    """Return the "state" cost of actually using those fingers for that chord.
+    This isn't captured by the transition costs.
+
+    The cost only depends on the colors of the keys and on the intervals between
+    the notes, so chords with the same shape share the same cost, from a global
+    cache.
+    """
+    if len(notes) < 2:
+        return 0
+
+    key = (left_or_right, tuple([ COLOR[note % 12] for note in notes ]),
+           tuple([ notes[i + 1] - notes[i] for i in range(0, len(notes) - 1) ]), tuple(fingers))
+
+    total_cost = CHORD_STATE_COSTS.get(key)
+    if total_cost is not None:
+        return total_cost
+
+    cost = getCostTable(left_or_right).cost
+
+    total_cost = 0
+    for i in range(0, len(notes) - 1):
+        total_cost += cost(notes[i], notes[i + 1], fingers[i], fingers[i + 1])
+
+    if len(CHORD_STATE_COSTS) >= MAX_CHORD_STATE_COSTS:
+        CHORD_STATE_COSTS.clear()
+
+    CHORD_STATE_COSTS[key] = total_cost
 
     return total_cost
@@ -0,0 +1,204 @@
+# Enumeration of the k best fingerings
+#
+# Use it by calling:
+#
+#    for fingered_notes, cost in computeFingeringKBest(notes, 'right', 10):
+#        ...
+#
+# The best path to each node is computed as usual (see 'fingering.relaxLayers()').
+# The following paths are then enumerated lazily with the Recursive Enumeration
+# Algorithm (Jiménez & Marzal): the next best path to a node is either the next
+# best path to its best previous node followed by the same transition, or the
+# best path through one of the other candidates of that node. So each new path
+# only requires to go backward from the last layer until the layer where it
+# leaves the previous ones, and only the nodes on those paths keep a list of
+# candidates.
+
+
+import heapq
+from .fingering import NotesInfo
+from .fingering import insertRests
+from .fingering import layerOptions
+from .fingering import preprocessNotes
+from .fingering import relaxLayers
+from .fingering import transitionMatrix
+
+
+#----------------------------------------------------------
+
+
+def computeFingeringKBest(notes, left_or_right, k):
+    """Compute the 'k' best distinct fingerings for the provided list of MIDI notes
+
+    Returns a list of at most 'k' (fingered notes, total cost) tuples, from the
+    best one, which is the result of 'computeFingering()'. See 'computeFingering()'
+    for the formats of the notes, and 'fingering.pathCost()' for the costs.
+    """
+    if k < 1:
+        raise ValueError('Invalid k: %d' % k)
+
+    notes, rests = preprocessNotes(notes)
+
+    if len(notes) == 0:
+        return [ (insertRests([], rests), 0) ]
+
+    enumeration = PathEnumeration(notes, left_or_right)
+
+    results = []
+    for nodes in enumeration.paths(k):
+        fingered_notes = [ dict(notes=infos.notes, fingers=options[node])
+                           for infos, options, node in zip(notes, enumeration.options, nodes) ]
+
+        results.append((insertRests(fingered_notes, rests), enumeration.pathCost(nodes)))
+
+    return results
+
+
+#----------------------------------------------------------
+
+
+class PathEnumeration(object):
+    """Lazy enumeration of the best paths of the graph of the provided list of
+    NotesInfo, without rests
+
+    The paths to a node are kept as a list of (score, previous node, rank of the
+    path to the previous node) tuples, the scores being the total costs of the
+    paths (like in 'fingering.relaxLayers()').
+    """
+
+    def __init__(self, notes, left_or_right):
+        self.notes = notes
+        self.left_or_right = left_or_right
+        self.options = [ layerOptions(infos.notes, infos.fingers, left_or_right) for infos in notes ]
+
+        # Transition costs, best scores and best previous nodes of each layer
+        self.matrices = []
+        self.scores = []
+        self.backpointers = []
+
+        scores = [ 0 ]
+        previous_infos = NotesInfo(notes=[], fingers=None)
+
+        for infos in notes:
+            self.matrices.append(transitionMatrix(previous_infos.notes, previous_infos.fingers,
+                                                  infos.notes, infos.fingers, left_or_right))
+
+            scores = relaxLayers([ infos ], left_or_right, scores, previous_infos, self.backpointers)
+            self.scores.append(scores)
+            previous_infos = infos
+
+        # Paths and candidates of the nodes, indexed by (layer, node), and nodes
+        # without any other path
+        self.found = {}
+        self.candidates = {}
+        self.exhausted = set()
+
+    def paths(self, k):
+        """Yield the nodes of the 'k' best paths, from the best one"""
+        last = len(self.notes) - 1
+
+        # Candidates for the last node: the paths to each node of the last layer
+        candidates = [ (score, node, 1) for node, score in enumerate(self.scores[last]) ]
+        heapq.heapify(candidates)
+
+        for i in range(0, k):
+            if len(candidates) == 0:
+                return
+
+            score, node, rank = heapq.heappop(candidates)
+            yield self.walkBackward(last, node, rank)
+
+            if self.nextPath(last, node, rank + 1):
+                heapq.heappush(candidates, (self.foundPaths(last, node)[rank][0], node, rank + 1))
+
+    def walkBackward(self, layer, node, rank):
+        """Return the nodes of the path of the provided rank to the provided node"""
+        nodes = []
+
+        while layer >= 0:
+            nodes.append(node)
+            score, node, rank = self.foundPaths(layer, node)[rank - 1]
+            layer -= 1
+
+        nodes.reverse()
+        return nodes
+
+    def pathCost(self, nodes):
+        """Return the total cost of the path going through the provided nodes (the
+        same than 'fingering.pathCost()')
+        """
+        total_cost = 0
+        previous_node = 0
+
+        for matrix, node in zip(self.matrices, nodes):
+            total_cost += matrix[node][previous_node]
+            previous_node = node
+
+        return total_cost
+
+    def foundPaths(self, layer, node):
+        """Return the list of the paths already found to the provided node"""
+        found = self.found.get((layer, node))
+
+        if found is None:
+            found = [ (self.scores[layer][node], self.backpointers[layer][node], 1) ]
+            self.found[(layer, node)] = found
+
+        return found
+
+    def nextPath(self, layer, node, rank):
+        """Find the path of the provided rank to the provided node, knowing the
+        previous ones, and indicates if it exists
+        """
+        # The next path to a node may require the next path to one of the nodes of
+        # the previous layer: use a stack instead of recursion, since there can be
+        # a lot of layers
+        stack = [ (layer, node, rank) ]
+
+        while len(stack) > 0:
+            current_layer, current_node, current_rank = stack[-1]
+            found = self.foundPaths(current_layer, current_node)
+
+            if (len(found) >= current_rank) or ((current_layer, current_node) in self.exhausted):
+                stack.pop()
+                continue
+
+            # The nodes of the first layer only have one path, from the root
+            if current_layer == 0:
+                self.exhausted.add((current_layer, current_node))
+                stack.pop()
+                continue
+
+            # The next path to the previous node of the last path found must be known
+            score, previous_node, previous_rank = found[-1]
+            previous_found = self.foundPaths(current_layer - 1, previous_node)
+
+            if (len(previous_found) <= previous_rank) and \
+               ((current_layer - 1, previous_node) not in self.exhausted):
+                stack.append((current_layer - 1, previous_node, previous_rank + 1))
+                continue
+
+            costs = self.matrices[current_layer][current_node]
+
+            candidates = self.candidates.get((current_layer, current_node))
+            if candidates is None:
+                # The best paths through the other nodes of the previous layer
+                candidates = [ (previous_score + cost, i, 1) for i, (previous_score, cost)
+                               in enumerate(zip(self.scores[current_layer - 1], costs))
+                               if i != previous_node ]
+                heapq.heapify(candidates)
+                self.candidates[(current_layer, current_node)] = candidates
+
+            if len(previous_found) > previous_rank:
+                heapq.heappush(candidates, (previous_found[previous_rank][0] + costs[previous_node],
+                                            previous_node, previous_rank + 1))
+
+            if len(candidates) > 0:
+                total_cost, previous_node, previous_rank = heapq.heappop(candidates)
+                found.append((total_cost, previous_node, previous_rank))
+            else:
+                self.exhausted.add((current_layer, current_node))
+
+            stack.pop()
+
+        return len(self.foundPaths(layer, node)) >= rank
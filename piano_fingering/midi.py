@@ -1,4 +1,9 @@
 # MIDI-related utility functions
+#
+# The MIDI notes of all the usual note names (with up to two accidentals, and
+# octaves from -1 to 10) are computed once, when the module is imported: the
+# conversion of those names is then a single dictionary lookup. The other names
+# are parsed by 'parseName()'.
 
 
 NOTE_INDICES = {
@@ -11,39 +16,74 @@ NOTE_INDICES = {
     'B': 11,
 }
 
+ACCIDENTALS = {
+    '': 0,
+    '#': 1,
+    'b': -1,
+    '##': 2,
+    'x': 2,
+    'bb': -2,
+}
 
-#----------------------------------------------------------
+DEFAULT_OCTAVE = 5
 
+# Octaves of the names in the table
+MIN_OCTAVE = -1
+MAX_OCTAVE = 10
 
-def nameToMidi(name):
-    """Return the MIDI note corresponding to the provided note name
 
-    Example of valid note names: C, C5, C#, C#3, Db, Db5
+#----------------------------------------------------------
 
-    When the octave isn't indicated, '5' is assumed
-    """
+
+def parseName(name):
+    """Parse a note name (see 'nameToMidi()'), without using the table"""
     note = NOTE_INDICES[name[0]]
-    octave = 5
+    octave = DEFAULT_OCTAVE
 
     offset = 1
 
     if len(name) > 1:
-        if name[1] == 'b':
-            note -= 1
-            offset = 2
-        elif name[1] == '#':
-            note += 1
+        if name[1:3] in ('##', 'bb'):
+            offset = 3
+        elif name[1] in ('#', 'b', 'x'):
             offset = 2
 
+        note += ACCIDENTALS[name[1:offset]]
+
     if len(name) > offset:
         try:
             octave = int(name[offset:])
-        except:
+        except ValueError:
             pass
 
     return octave * 12 + note
 
 
+NAMES = {}
+
+for letter in NOTE_INDICES:
+    for accidental in ACCIDENTALS:
+        for octave in [ '' ] + [ str(x) for x in range(MIN_OCTAVE, MAX_OCTAVE + 1) ]:
+            NAMES[letter + accidental + octave] = parseName(letter + accidental + octave)
+
+
+#----------------------------------------------------------
+
+
+def nameToMidi(name):
+    """Return the MIDI note corresponding to the provided note name
+
+    Example of valid note names: C, C5, C#, C#3, Db, Db5, C##4, Cx4, Dbb-1
+
+    When the octave isn't indicated, '5' is assumed
+    """
+    midi_note = NAMES.get(name)
+    if midi_note is None:
+        return parseName(name)
+
+    return midi_note
+
+
 #----------------------------------------------------------
 
 
@@ -60,14 +100,37 @@ def listToMidi(notes):
       - A chord with fingering: { 'notes': ['C', 'D', 'E'], 'fingers': [1, 2, 3] }
       - A rest: []
     """
+    names = NAMES
     result = []
 
     for x in notes:
-        if isinstance(x, dict):
+        if isinstance(x, str):
+            midi_note = names.get(x)
+            result.append(midi_note if midi_note is not None else parseName(x))
+        elif isinstance(x, dict):
             result.append(dict(notes=listToMidi(x['notes']), fingers=x['fingers']))
         elif isinstance(x, list):
-            result.append(listToMidi(x))
+            try:
+                result.append([ names[name] for name in x ])
+            except (KeyError, TypeError):
+                result.append(listToMidi(x))
         else:
             result.append(nameToMidi(x))
 
     return result
+
+
+def stringToMidi(text):
+    """Convert a string of note names, separated by whitespaces and/or commas, into
+    a list of MIDI notes
+
+    Example: 'C5 E5 G5, C6'
+    """
+    names = text.replace(',', ' ').split()
+
+    try:
+        midi_notes = [ NAMES[name] for name in names ]
+    except KeyError:
+        midi_notes = [ nameToMidi(name) for name in names ]
+
+    return midi_notes
@@ -0,0 +1,535 @@
+# Reading and writing of MusicXML files
+#
+# Use it by calling:
+#
+#    for entry in iterMusicXmlNotes('piece.musicxml', part='P1', staff=1):
+#        ...
+#
+# The elements are in the formats accepted by 'computeFingering()'. To save the
+# fingering in a copy of the file, as <fingering> elements:
+#
+#    annotateMusicXml('piece.musicxml', 'fingered.musicxml', 'right', staff=1)
+#
+# Only partwise files (<score-partwise>) are supported, a ValueError being raised
+# otherwise. The onsets of the notes are computed from their <duration> and the
+# <backup> and <forward> elements, so the notes of several voices (or staves)
+# starting together form a single chord. The notes ending a tie (<tie
+# type="stop"/>) are held, not played again, so they are ignored in both
+# directions.
+#
+# Both directions work incrementally: the reader uses 'iterparse()' and discards
+# each measure once processed, and the writer copies the file while it is
+# parsed, only keeping the notes of the measure being processed. So the memory
+# used doesn't depend on the size of the file.
+
+
+from fractions import Fraction
+from xml.etree.ElementTree import Comment
+from xml.etree.ElementTree import Element
+from xml.etree.ElementTree import TreeBuilder
+from xml.etree.ElementTree import iterparse
+import xml.sax
+from xml.sax.handler import ContentHandler
+from xml.sax.handler import property_lexical_handler
+from xml.sax.saxutils import escape
+from xml.sax.saxutils import quoteattr
+from .smf import nextFingeredNotes
+from .smf import openDestination
+from .smf import openSource
+from .streaming import iterFingering
+
+
+#----------------------------------------------------------
+
+
+STEPS = {
+    'C': 0,
+    'D': 2,
+    'E': 4,
+    'F': 5,
+    'G': 7,
+    'A': 9,
+    'B': 11,
+}
+
+# Elements moving the current position in a part
+TIMED_ELEMENTS = ('note', 'backup', 'forward', 'attributes')
+
+# Elements following <notations> in a <note>
+AFTER_NOTATIONS = ('lyric', 'play', 'listen')
+
+# Number of strings buffered by the writer before writing them
+WRITE_BUFFER_SIZE = 16384
+
+
+#----------------------------------------------------------
+
+
+def iterMusicXmlNotes(source, part=None, staff=None, voice=None):
+    """Yield the notes of a part of a MusicXML file, in the formats accepted by
+    'computeFingering()'
+
+    'source' is a filename, a binary file object or a bytes-like object. 'part' is
+    the id of the part to read (by default, the first one). 'staff' and 'voice'
+    only keep the notes of a staff (for example 1 for the right hand of a piano
+    part, 2 for the left hand) or a voice (by default, all of them).
+
+    The notes starting at the same time (the ones with a <chord/> element, but
+    also the ones of different voices or staves) are merged into chords, in the
+    order of their onsets. Grace and cue notes are ignored, as well as the notes
+    ending a tie (a chord whose notes are all tied to the previous one is
+    skipped). A rest is only yielded when no other selected note starts with it.
+    """
+    with openSource(source) as stream:
+        root = None
+        current_part = None
+        selected_part = part
+        timeline = None
+        measure = []
+
+        for event, element in iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                    checkRoot(root.tag)
+                elif element.tag == 'part':
+                    current_part = element
+                    if selected_part is None:
+                        selected_part = element.get('id')
+                    if element.get('id') == selected_part:
+                        timeline = Timeline()
+                continue
+
+            if (timeline is not None) and (element.tag in TIMED_ELEMENTS):
+                onset = timeline.process(element)
+                if (element.tag == 'note') and isSelected(element, staff, voice):
+                    measure.append((onset, element))
+
+            elif element.tag == 'measure':
+                if timeline is not None:
+                    for notes in groupNotes(measure):
+                        entry = groupEntry(notes)
+                        if entry is not None:
+                            yield entry
+
+                    measure = []
+                    timeline.endMeasure()
+
+                # The measure was processed, free it
+                current_part.remove(element)
+
+            elif element.tag == 'part':
+                root.remove(element)
+                current_part = None
+                timeline = None
+
+
+def checkRoot(tag):
+    """Raise a ValueError if the provided root element isn't the one of a partwise
+    file
+    """
+    if tag != 'score-partwise':
+        raise ValueError('Only partwise MusicXML files are supported (root element: <%s>)' % tag)
+
+
+def groupNotes(notes):
+    """Group the provided (onset, <note> element) tuples by onset, and return the
+    lists of <note> elements in the order of their onsets
+    """
+    groups = {}
+    for onset, note in notes:
+        groups.setdefault(onset, []).append(note)
+
+    return [ groups[onset] for onset in sorted(groups) ]
+
+
+def groupEntry(notes):
+    """Return the entry of a list of <note> elements starting together, in the
+    formats accepted by 'computeFingering()', or None if all of them are held
+    """
+    chord = sorted(set([ midiNote(note) for note in notes if isPlayed(note) ]))
+
+    if len(chord) == 1:
+        return chord[0]
+    elif len(chord) > 1:
+        return chord
+    elif all([ midiNote(note) is None for note in notes ]):
+        return []
+
+    return None
+
+
+def isSelected(note, staff, voice):
+    """Indicates if the provided <note> element must be processed"""
+    if (note.find('grace') is not None) or (note.find('cue') is not None):
+        return False
+
+    if (staff is not None) and (note.findtext('staff', '1').strip() != str(staff)):
+        return False
+
+    if (voice is not None) and (note.findtext('voice', '1').strip() != str(voice)):
+        return False
+
+    return True
+
+
+def isPlayed(note):
+    """Indicates if the provided <note> element is a note to play (not a rest, nor
+    the end of a tie)
+    """
+    if midiNote(note) is None:
+        return False
+
+    return not any([ tie.get('type') == 'stop' for tie in note.findall('tie') ])
+
+
+def midiNote(note):
+    """Return the MIDI note of the provided <note> element, or None for a rest"""
+    pitch = note.find('pitch')
+    if pitch is None:
+        return None
+
+    alter = float(pitch.findtext('alter', '0'))
+
+    return (int(pitch.findtext('octave')) + 1) * 12 + STEPS[pitch.findtext('step').strip()] + \
+           int(round(alter))
+
+
+class Timeline(object):
+    """Current position in a part (in quarter notes), following the <duration> of
+    the notes and the <backup> and <forward> elements
+    """
+
+    def __init__(self):
+        self.divisions = 1
+        self.position = Fraction(0)
+        self.measure_end = self.position
+        self.onset = self.position
+
+    def process(self, element):
+        """Update the position with the provided element (see TIMED_ELEMENTS), and
+        return the onset of a <note> element
+        """
+        if element.tag == 'attributes':
+            divisions = element.findtext('divisions')
+            if divisions is not None:
+                self.divisions = Fraction(divisions.strip())
+            return None
+
+        if element.find('grace') is not None:
+            # Grace notes have no duration
+            return self.position
+
+        duration = Fraction(element.findtext('duration', '0').strip()) / self.divisions
+
+        if element.tag == 'backup':
+            self.position -= duration
+        elif element.tag == 'forward':
+            self.position += duration
+        elif element.find('chord') is None:
+            self.onset = self.position
+            self.position += duration
+
+        self.measure_end = max(self.measure_end, self.position)
+
+        return self.onset
+
+    def endMeasure(self):
+        """Move to the start of the next measure"""
+        self.position = self.measure_end
+
+
+#----------------------------------------------------------
+
+
+def annotateMusicXml(source, destination, left_or_right, part=None, staff=None, voice=None,
+                     lag=None):
+    """Compute the fingering of a part of a MusicXML file, and save it in a copy
+    of the file (see 'writeMusicXmlFingering()')
+
+    'source' must be a filename or a bytes-like object, since it is read twice.
+    See 'iterFingering()' for 'lag': by default, the results are the same than
+    the ones of 'computeFingering()'.
+    """
+    fingered_notes = iterFingering(iterMusicXmlNotes(source, part, staff, voice), left_or_right,
+                                   lag=lag)
+    writeMusicXmlFingering(source, destination, fingered_notes, part, staff, voice)
+
+
+def writeMusicXmlFingering(source, destination, fingered_notes, part=None, staff=None,
+                           voice=None):
+    """Copy a MusicXML file, adding the provided fingering (in the format returned
+    by 'computeFingering()') as <fingering> elements
+
+    The fingering must be the one of the notes returned by 'iterMusicXmlNotes()'
+    with the same 'part', 'staff' and 'voice'. The other elements are copied, but
+    the formatting of the file (quotes, empty elements, ...) may change.
+    """
+    with openSource(source) as stream, openDestination(destination) as output:
+        writer = FingeringWriter(output, iter(fingered_notes), part, staff, voice)
+
+        parser = xml.sax.make_parser()
+        parser.setContentHandler(writer)
+        parser.setProperty(property_lexical_handler, writer)
+        parser.parse(stream)
+
+        writer.flush()
+
+
+class FingeringWriter(ContentHandler):
+    """SAX handler copying the document to a binary stream, while inserting the
+    fingering in the selected notes
+
+    The elements are written as soon as they are parsed, except the ones changing
+    the position in the part (see TIMED_ELEMENTS), which are built as ElementTree
+    elements (comments included). The selected notes are kept until the end of
+    their measure, to insert the fingering in the order of their onsets.
+    """
+
+    def __init__(self, output, fingered_notes, part, staff, voice):
+        ContentHandler.__init__(self)
+
+        self.output = output
+        self.fingered_notes = fingered_notes
+        self.part = part
+        self.staff = staff
+        self.voice = voice
+
+        self.buffer = []
+        self.pending_tag = False
+        self.in_dtd = False
+
+        self.root = None
+        self.current_part = None
+        self.timeline = None
+        self.builder = None
+        self.depth = 0
+
+        # Selected notes of the current measure, as (onset, <note> element)
+        # tuples, and index in the buffer of the first one
+        self.measure = []
+        self.measure_start = 0
+
+    # ContentHandler methods
+
+    def startDocument(self):
+        self.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+
+    def startElement(self, name, attrs):
+        if self.builder is not None:
+            self.builder.start(name, dict(attrs))
+            self.depth += 1
+            return
+
+        if self.root is None:
+            self.root = name
+            checkRoot(name)
+
+        if (self.timeline is not None) and (name in TIMED_ELEMENTS):
+            self.builder = TreeBuilder(insert_comments=True)
+            self.builder.start(name, dict(attrs))
+            self.depth = 1
+            return
+
+        if name == 'part':
+            self.current_part = attrs.get('id')
+            if self.part is None:
+                self.part = self.current_part
+            if self.current_part == self.part:
+                self.timeline = Timeline()
+
+        self.startTag(name, attrs)
+
+    def endElement(self, name):
+        if self.builder is not None:
+            self.builder.end(name)
+            self.depth -= 1
+
+            if self.depth == 0:
+                element = self.builder.close()
+                self.builder = None
+
+                onset = self.timeline.process(element)
+
+                if (name == 'note') and isSelected(element, self.staff, self.voice):
+                    # Written at the end of the measure
+                    self.closeTag()
+                    if len(self.measure) == 0:
+                        self.measure_start = len(self.buffer)
+                    self.measure.append((onset, element))
+                    self.buffer.append(element)
+                else:
+                    self.writeElement(element)
+            return
+
+        if self.timeline is not None:
+            if name == 'measure':
+                self.endMeasure()
+            elif name == 'part':
+                self.timeline = None
+
+        self.endTag(name)
+
+    def characters(self, content):
+        if self.builder is not None:
+            self.builder.data(content)
+        else:
+            self.text(content)
+
+    def ignorableWhitespace(self, content):
+        self.characters(content)
+
+    def processingInstruction(self, target, data):
+        self.closeTag()
+        self.write('<?%s %s?>' % (target, data))
+
+    # LexicalHandler methods
+
+    def comment(self, content):
+        if self.builder is not None:
+            self.builder.comment(content)
+        elif not self.in_dtd:
+            self.closeTag()
+            self.write('<!--%s-->' % content)
+
+    def startDTD(self, name, public_id, system_id):
+        self.in_dtd = True
+
+        if public_id is not None:
+            self.write('<!DOCTYPE %s PUBLIC "%s" "%s">\n' % (name, public_id, system_id))
+        elif system_id is not None:
+            self.write('<!DOCTYPE %s SYSTEM "%s">\n' % (name, system_id))
+        else:
+            self.write('<!DOCTYPE %s>\n' % name)
+
+    def endDTD(self):
+        self.in_dtd = False
+
+    def startCDATA(self):
+        pass
+
+    def endCDATA(self):
+        pass
+
+    # Fingering
+
+    def endMeasure(self):
+        """Insert the fingering in the selected notes of the measure, and write
+        them
+        """
+        for notes in groupNotes(self.measure):
+            self.annotate(notes)
+
+        self.timeline.endMeasure()
+
+        if len(self.measure) == 0:
+            return
+
+        # The notes are written at their place in the buffer, after the tags
+        # preceding them were closed
+        pending_tag = self.pending_tag
+        self.pending_tag = False
+
+        contents = self.buffer[self.measure_start:]
+        del self.buffer[self.measure_start:]
+        self.measure = []
+
+        for content in contents:
+            if isinstance(content, str):
+                self.buffer.append(content)
+            else:
+                self.writeElement(content)
+
+        self.pending_tag = pending_tag
+
+    def annotate(self, notes):
+        """Insert the fingers of a list of selected <note> elements starting together"""
+        notes = [ note for note in notes if isPlayed(note) ]
+        if len(notes) == 0:
+            return
+
+        entry = nextFingeredNotes(self.fingered_notes)
+        fingers = dict(zip(entry['notes'], entry['fingers']))
+
+        for note in notes:
+            midi_note = midiNote(note)
+            if midi_note not in fingers:
+                raise ValueError('The fingering does not match note %d' % midi_note)
+
+            self.insertFingering(note, fingers[midi_note])
+
+    def insertFingering(self, note, finger):
+        """Insert a <fingering> element in the provided <note> element"""
+        notations = note.find('notations')
+        if notations is None:
+            notations = Element('notations')
+
+            position = len(note)
+            for index, child in enumerate(note):
+                if child.tag in AFTER_NOTATIONS:
+                    position = index
+                    break
+
+            note.insert(position, notations)
+
+        technical = notations.find('technical')
+        if technical is None:
+            technical = Element('technical')
+            notations.append(technical)
+
+        fingering = Element('fingering')
+        fingering.text = str(finger)
+        technical.append(fingering)
+
+    # Output
+
+    def startTag(self, name, attrs):
+        self.closeTag()
+        self.write('<' + name + ''.join([ ' %s=%s' % (key, quoteattr(value))
+                                          for key, value in attrs.items() ]))
+        self.pending_tag = True
+
+    def endTag(self, name):
+        if self.pending_tag:
+            self.write('/>')
+            self.pending_tag = False
+        else:
+            self.write('</%s>' % name)
+
+    def closeTag(self):
+        if self.pending_tag:
+            self.write('>')
+            self.pending_tag = False
+
+    def text(self, content):
+        if content:
+            self.closeTag()
+            self.write(escape(content))
+
+    def writeElement(self, element):
+        if element.tag is Comment:
+            self.closeTag()
+            self.write('<!--%s-->' % element.text)
+            return
+
+        self.startTag(element.tag, element.attrib)
+        if element.text:
+            self.text(element.text)
+
+        for child in element:
+            self.writeElement(child)
+            if child.tail:
+                self.text(child.tail)
+
+        self.endTag(element.tag)
+
+    def write(self, content):
+        self.buffer.append(content)
+
+        # The buffer can't be flushed while it contains the notes of a measure
+        if (len(self.buffer) >= WRITE_BUFFER_SIZE) and (len(self.measure) == 0):
+            self.flush()
+
+    def flush(self):
+        self.output.write(''.join(self.buffer).encode('utf-8'))
+        self.buffer = []
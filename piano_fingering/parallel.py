@@ -0,0 +1,357 @@
+# Parallel computation of the fingering, using a pool of processes
+#
+# Used by 'computeFingering()' when called with workers != 1.
+#
+# Finding the best scores of the last layer is a chain of min-plus products: the
+# scores of a layer are the scores of the previous one, "multiplied" by the
+# matrix of the transition costs (see 'fingering.transitionMatrix()'). Those
+# products being associative, the list of notes is split in ranges, whose
+# products are computed in parallel, then combined.
+#
+# The product of the matrices of a range quickly converges to a matrix of rank
+# one: whatever the scores of the layer preceding the range, after a few layers,
+# the best paths go through the same nodes and the scores relative to the best
+# one (see 'fingering.relaxLayers()') are the same. So instead of computing the
+# whole product, each worker relaxes the layers of its range starting from
+# arbitrary scores (all 0). Then, from the first range to the last, the layers
+# of each range are relaxed again from the actual scores of the previous layer,
+# until the scores are exactly the same than the ones computed by the worker:
+# from that layer, the results of the worker are the ones of the sequential
+# computation with relative scores.
+#
+# Those results are thus always the same, whatever the number of workers. They
+# can only differ from the ones of the sequential computation with the total
+# scores (the default one) between fingerings whose costs are equal up to the
+# rounding.
+#
+# The layers with only one node (notes with a fingering provided by the user,
+# chords of five notes) are on every path, and their scores are always 0: the
+# ranges are preferably started after them, so nothing has to be computed again.
+#
+# 'computeFingeringBatch()' and 'iterFingeringBatch()' use the same pool to
+# compute the fingering of many lists of notes.
+#
+# The pool is created on the first use and kept for the following calls. The
+# cost tables are shared with its processes through shared memory.
+
+
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+import os
+import threading
+import warnings
+from .fingering import MEMORY_MODES
+from .fingering import NotesInfo
+from .fingering import bestNode
+from .fingering import computeFingering
+from .fingering import findBestPath
+from .fingering import getCostTable
+from .fingering import layerOptions
+from .fingering import relaxLayers
+from .fingering import useCostTables
+from .fingering import walkBackward
+from .fingering import warmup
+from .storage import attachCostTables
+from .storage import publishCostTables
+from .storage import unpublishCostTables
+
+
+#----------------------------------------------------------
+
+
+# Number of tasks per worker: more tasks balance the load better, but each one
+# has a cost
+TASKS_PER_WORKER = 4
+
+# Lists shorter than that are always processed by the calling process
+MIN_PARALLEL_LAYERS = 200
+
+# Batches with fewer notes than that are always processed by the calling process
+MIN_PARALLEL_BATCH_NOTES = 2000
+
+# Number of layers of each range whose scores are compared with the actual ones.
+# In practice, the scores are the same after less than 30 layers.
+NB_COMPARED_LAYERS = 64
+
+
+_pool = None
+_pool_workers = None
+_pool_block = None
+_pool_lock = threading.Lock()
+
+
+#----------------------------------------------------------
+
+
+def getPool(workers=None):
+    """Return the pool of processes, with the provided number of workers (by
+    default, the number of processors)
+
+    The pool is kept for the following calls, unless another number of workers is
+    requested. The cost tables are published in shared memory, so the processes
+    don't have to load or compute them (see 'storage.publishCostTables()').
+    """
+    global _pool, _pool_workers, _pool_block
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    with _pool_lock:
+        if (_pool is None) or (_pool_workers != workers):
+            _shutdownPool()
+
+            try:
+                _pool_block = publishCostTables(getCostTable('right'), getCostTable('left'))
+                _pool = ProcessPoolExecutor(max_workers=workers, initializer=initializeWorker,
+                                            initargs=(_pool_block.name,))
+            except (ImportError, OSError):
+                _pool = ProcessPoolExecutor(max_workers=workers, initializer=warmup)
+
+            _pool_workers = workers
+
+        return _pool
+
+
+def shutdownPool():
+    """Stop the processes of the pool, if any"""
+    with _pool_lock:
+        _shutdownPool()
+
+
+def _shutdownPool():
+    global _pool, _pool_workers, _pool_block
+
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+        _pool_workers = None
+
+    if _pool_block is not None:
+        unpublishCostTables(_pool_block)
+        _pool_block = None
+
+
+def initializeWorker(name):
+    useCostTables(*attachCostTables(name))
+    warmup()
+
+
+atexit.register(shutdownPool)
+
+
+#----------------------------------------------------------
+
+
+def computeFingeringBatch(notes_lists, hands, engine='python', workers=None, chunksize=None):
+    """Compute the best fingering of each list of MIDI notes of the provided list,
+    using the pool of processes, and return the results in the same order
+
+    'hands' is either 'left' or 'right' for all the lists, or a list with one hand
+    per list of notes. See 'computeFingering()' for the format of the lists.
+
+    The lists are sent to the processes by chunks of 'chunksize' lists (by
+    default, each process receives about 'TASKS_PER_WORKER' chunks). Small
+    batches are processed by the calling process.
+    """
+    results = [ None ] * len(notes_lists)
+
+    for index, result in iterFingeringBatch(notes_lists, hands, engine=engine, workers=workers,
+                                            chunksize=chunksize):
+        results[index] = result
+
+    return results
+
+
+def iterFingeringBatch(notes_lists, hands, engine='python', workers=None, chunksize=None):
+    """Same as 'computeFingeringBatch()', but yields (index, result) tuples as soon
+    as the results are available (not necessarily in order)
+    """
+    notes_lists = list(notes_lists)
+
+    if isinstance(hands, str):
+        hands = [ hands ] * len(notes_lists)
+    else:
+        hands = list(hands)
+        if len(hands) != len(notes_lists):
+            raise ValueError('Expected %d hands, got %d' % (len(notes_lists), len(hands)))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if (workers <= 1) or (len(notes_lists) <= 1) or \
+       (sum([ len(notes) for notes in notes_lists ]) < MIN_PARALLEL_BATCH_NOTES):
+        for index, (notes, left_or_right) in enumerate(zip(notes_lists, hands)):
+            yield index, computeFingering(notes, left_or_right, engine=engine)
+        return
+
+    if chunksize is None:
+        chunksize = max(len(notes_lists) // (workers * TASKS_PER_WORKER), 1)
+
+    pool = getPool(workers)
+
+    futures = {}
+    for start in range(0, len(notes_lists), chunksize):
+        future = pool.submit(computeFingeringChunk, notes_lists[start:start + chunksize],
+                             hands[start:start + chunksize], engine)
+        futures[future] = start
+
+    for future in as_completed(futures):
+        for index, result in enumerate(future.result(), futures[future]):
+            yield index, result
+
+
+def computeFingeringChunk(notes_lists, hands, engine):
+    return [ computeFingering(notes, left_or_right, engine=engine)
+             for notes, left_or_right in zip(notes_lists, hands) ]
+
+
+#----------------------------------------------------------
+
+
+def computeBestPath(notes, left_or_right, engine='python', memory='full', workers=None,
+                    beam=None, margin=None):
+    """Compute the best fingering for the provided list of NotesInfo (see
+    'fingering.preprocessNotes()'), without rests, using the pool of processes
+
+    With 'memory' set to 'compact', the best previous nodes are stored as bytes.
+    The 'checkpoints' mode can't be used when the list is split (the best previous
+    nodes of every range are needed): the 'compact' one is used instead, with a
+    RuntimeWarning.
+
+    The lists too short to be split (or with 'workers' set to 1) are computed by
+    the calling process, like with 'fingering.computeBestPath()'. The other ones
+    use relative scores (see the top of this file).
+    """
+    if memory not in MEMORY_MODES:
+        raise ValueError("Unknown memory mode: '%s'" % memory)
+
+    relaxLayers = engineRelaxLayers(engine)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if (workers <= 1) or (len(notes) < MIN_PARALLEL_LAYERS):
+        return findBestPath(notes, left_or_right, relaxLayers, memory, beam=beam, margin=margin)
+
+    ranges = splitRanges(notes, workers * TASKS_PER_WORKER)
+    if memory == 'checkpoints':
+        warnings.warn("The 'checkpoints' memory mode isn't supported with several workers, "
+                      "the 'compact' one is used instead", RuntimeWarning, stacklevel=3)
+
+    compact = (memory != 'full')
+
+    pool = getPool(workers)
+
+    futures = []
+    for start, end in ranges:
+        futures.append(pool.submit(relaxRange, notes[start:end], previousInfos(notes, start),
+                                   left_or_right, engine, compact, start == 0, beam, margin))
+
+    # Combine the results of the ranges
+    backpointers = []
+    scores = [ 0 ]
+
+    for (start, end), future in zip(ranges, futures):
+        range_backpointers, range_scores, first_scores = future.result()
+
+        # Relax the first layers again, until the scores are the same
+        for index in range(start, end):
+            layer_backpointers = []
+            scores = relaxLayers([ notes[index] ], left_or_right, scores, previousInfos(notes, index),
+                                 layer_backpointers, compact, beam=beam, margin=margin,
+                                 relative=True)
+            backpointers.append(layer_backpointers[0])
+
+            if (index - start < len(first_scores)) and (list(scores) == first_scores[index - start]):
+                backpointers.extend(range_backpointers[index - start + 1:])
+                scores = range_scores
+                break
+
+    result = []
+    walkBackward(notes, backpointers, bestNode(scores), left_or_right, result)
+    result.reverse()
+
+    return result
+
+
+def relaxRange(notes, previous_infos, left_or_right, engine, compact, exact, beam=None,
+               margin=None):
+    """Relax the layers of the provided list of NotesInfo, following the notes of
+    'previous_infos', with all the scores of that layer at 0 (unless 'exact' is
+    True, for the first range)
+
+    Returns the best previous nodes of each layer, the scores of the last layer,
+    and the scores of the first 'NB_COMPARED_LAYERS' layers.
+    """
+    relaxLayers = engineRelaxLayers(engine)
+
+    if exact:
+        scores = [ 0 ]
+    else:
+        scores = [ 0 ] * len(layerOptions(previous_infos.notes, previous_infos.fingers, left_or_right))
+
+    backpointers = []
+    first_scores = []
+
+    for index in range(0, min(NB_COMPARED_LAYERS, len(notes))):
+        scores = relaxLayers([ notes[index] ], left_or_right, scores, previous_infos, backpointers,
+                             compact, beam=beam, margin=margin, relative=True)
+        first_scores.append(list(scores))
+        previous_infos = notes[index]
+
+    if len(notes) > NB_COMPARED_LAYERS:
+        scores = relaxLayers(notes[NB_COMPARED_LAYERS:], left_or_right, scores, previous_infos,
+                             backpointers, compact, beam=beam, margin=margin, relative=True)
+
+    return backpointers, scores, first_scores
+
+
+def engineRelaxLayers(engine):
+    """Return the implementation of 'fingering.relaxLayers()' of the provided engine"""
+    if engine == 'python':
+        return relaxLayers
+    elif engine == 'numpy':
+        from .vectorized import relaxLayers as relaxLayersVectorized
+        return relaxLayersVectorized
+    elif engine == 'branch_and_bound':
+        from .search import relaxLayers as relaxLayersSearch
+        return relaxLayersSearch
+    else:
+        raise ValueError("Unknown engine: '%s'" % engine)
+
+
+def previousInfos(notes, index):
+    return notes[index - 1] if index > 0 else NotesInfo(notes=[], fingers=None)
+
+
+#----------------------------------------------------------
+
+
+def isAnchor(infos):
+    """Indicates if the layer of the provided NotesInfo only has one node"""
+    return (infos.fingers is not None) or (len(infos.notes) == 5)
+
+
+def splitRanges(notes, nb_ranges):
+    """Split the provided list of NotesInfo in about 'nb_ranges' ranges of similar
+    lengths, starting after an anchor (see 'isAnchor()') when possible
+
+    Returns a list of (start, end) indices.
+    """
+    target = max(len(notes) // max(nb_ranges, 1), 1)
+
+    ranges = []
+    start = 0
+
+    for index, infos in enumerate(notes):
+        length = index + 1 - start
+        if (index + 1 < len(notes)) and \
+           (((length >= target) and isAnchor(infos)) or (length >= target + target // 4)):
+            ranges.append((start, index + 1))
+            start = index + 1
+
+    if start < len(notes):
+        ranges.append((start, len(notes)))
+
+    return ranges
@@ -0,0 +1,192 @@
+# Branch and bound implementation of the fingering algorithm
+#
+# Used by 'computeFingering()' when called with engine='branch_and_bound'.
+#
+# The Python implementation computes the cost of every transition between two
+# consecutive layers. But most of them (large stretches, crossings, ...) can't
+# be on the best path. This implementation uses lower bounds of the costs of
+# the transitions to the nodes of a layer, derived from the cost tables: for a
+# move between two notes, the cost of the best finger for the first note.
+#
+# For each node of a layer, the nodes of the previous layer are then explored
+# from the best one, and the exploration stops as soon as the score of a node
+# plus the lower bound exceeds the best total cost found. The costs are summed
+# in the same order than in the Python implementation, and the lower bounds are
+# lower or equal in each term of the sums, so the results are exactly the same.
+#
+# 'searchFingering()' also reports the number of transitions whose cost was
+# computed, compared to the Python implementation.
+
+
+from .cost import NB_FINGERS
+from .fingering import INFINITY
+from .fingering import calcStateCost
+from .fingering import findBestPath
+from .fingering import getCostTable
+from .fingering import insertRests
+from .fingering import layerOptions
+from .fingering import preprocessNotes
+from .fingering import pruneScores
+from .fingering import transitionCost
+
+
+#----------------------------------------------------------
+
+
+class LowerBoundTable(object):
+    """For each move between two notes, the minimum of its cost over the fingers
+    used for the first note, indexed by (pitch class of the first note, interval,
+    finger of the second note)
+    """
+
+    def __init__(self, cost_table):
+        self.cost_table = cost_table
+        self.max_interval = cost_table.max_interval
+
+        self.values = []
+        for pitch_class in range(0, 12):
+            for interval in range(-self.max_interval, self.max_interval + 1):
+                for f2 in range(1, NB_FINGERS + 1):
+                    self.values.append(min([ cost_table.cost(pitch_class, pitch_class + interval, f1, f2)
+                                             for f1 in range(1, NB_FINGERS + 1) ]))
+
+    def bound(self, n1, n2, f2):
+        # The fingers imposed by the user can be negative for the left hand (see
+        # 'cost.MirroredCostTable')
+        f2 = abs(f2)
+        interval = n2 - n1
+
+        if -self.max_interval <= interval <= self.max_interval:
+            return self.values[((n1 % 12) * (2 * self.max_interval + 1) + interval + self.max_interval) *
+                               NB_FINGERS + f2 - 1]
+
+        return min([ self.cost_table.cost(n1, n2, f1, f2) for f1 in range(1, NB_FINGERS + 1) ])
+
+
+LOWER_BOUND_TABLES = {}
+
+def getLowerBoundTable(left_or_right):
+    cost_table = getCostTable(left_or_right)
+
+    table = LOWER_BOUND_TABLES.get(left_or_right)
+    if (table is None) or (table.cost_table is not cost_table):
+        table = LowerBoundTable(cost_table)
+        LOWER_BOUND_TABLES[left_or_right] = table
+
+    return table
+
+
+#----------------------------------------------------------
+
+
+def searchFingering(notes, left_or_right):
+    """Same as 'computeFingering(notes, left_or_right)', but also returns the number
+    of transitions whose cost was computed
+
+    Returns a tuple (fingered notes, statistics), the statistics being a dictionary
+    with the number of transitions whose cost was computed ('edges_evaluated') and
+    the number of transitions of the whole graph ('edges_total').
+    """
+    notes, rests = preprocessNotes(notes)
+
+    stats = dict(edges_evaluated=0, edges_total=0)
+    result = computeBestPath(notes, left_or_right, stats=stats)
+
+    return insertRests(result, rests), stats
+
+
+def computeBestPath(notes, left_or_right, memory='full', beam=None, margin=None, stats=None):
+    """Compute the best fingering for the provided list of NotesInfo (see
+    'fingering.preprocessNotes()'), without rests
+
+    If 'stats' is a dictionary, the numbers of transitions are added to it (see
+    'searchFingering()').
+    """
+    def relax(notes, left_or_right, scores, previous_infos, backpointers=None, compact=False,
+              beam=None, margin=None, relative=False):
+        return relaxLayers(notes, left_or_right, scores, previous_infos, backpointers, compact,
+                           beam=beam, margin=margin, relative=relative, stats=stats)
+
+    return findBestPath(notes, left_or_right, relax, memory, beam=beam, margin=margin)
+
+
+def relaxLayers(notes, left_or_right, scores, previous_infos, backpointers=None, compact=False,
+                beam=None, margin=None, relative=False, stats=None):
+    """Branch and bound version of 'fingering.relaxLayers()'
+
+    If 'stats' is a dictionary, the numbers of transitions are added to it (see
+    'searchFingering()').
+    """
+    pruning = (beam is not None) or (margin is not None)
+
+    lower_bounds = getLowerBoundTable(left_or_right)
+    edges_evaluated = 0
+    edges_total = 0
+
+    previous_options = layerOptions(previous_infos.notes, previous_infos.fingers, left_or_right)
+
+    for infos in notes:
+        options = layerOptions(infos.notes, infos.fingers, left_or_right)
+
+        # Nodes of the previous layer, from the best one (the first one in case of
+        # equality)
+        previous_nodes = sorted([ i for i in range(0, len(scores)) if scores[i] != INFINITY ],
+                                key=scores.__getitem__)
+
+        best_previous_nodes = []
+        current_scores = []
+
+        for option in options:
+            state_cost = calcStateCost(infos.notes, option, left_or_right)
+
+            # Lower bound of the cost from any node of the previous layer, summed in
+            # the same order than in 'fingering.transitionCost()'
+            bound = 0
+            for i in range(0, len(infos.notes)):
+                for j in range(0, len(previous_infos.notes)):
+                    bound += lower_bounds.bound(previous_infos.notes[j], infos.notes[i], option[i])
+
+            bound += state_cost
+
+            min_score = INFINITY
+            best_previous_node = None
+
+            for previous_node in previous_nodes:
+                if scores[previous_node] + bound > min_score:
+                    break
+
+                total_cost = scores[previous_node]
+                total_cost += transitionCost(previous_infos.notes, previous_options[previous_node],
+                                             infos.notes, option, left_or_right) + state_cost
+                edges_evaluated += 1
+
+                if (total_cost < min_score) or \
+                   ((total_cost == min_score) and (previous_node < best_previous_node)):
+                    min_score = total_cost
+                    best_previous_node = previous_node
+
+            best_previous_nodes.append(best_previous_node)
+            current_scores.append(min_score)
+
+        edges_total += len(scores) * len(options)
+
+        if backpointers is not None:
+            backpointers.append(bytes(best_previous_nodes) if compact else best_previous_nodes)
+
+        if relative:
+            best_score = min(current_scores)
+            scores = [ score - best_score for score in current_scores ]
+        else:
+            scores = current_scores
+
+        if pruning:
+            scores = pruneScores(scores, beam, margin)
+
+        previous_infos = infos
+        previous_options = options
+
+    if stats is not None:
+        stats['edges_evaluated'] += edges_evaluated
+        stats['edges_total'] += edges_total
+
+    return scores
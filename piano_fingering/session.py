@@ -0,0 +1,190 @@
+# Incremental computation of the fingering of an edited list of notes
+#
+# Use it by calling:
+#
+#    session = FingeringSession(notes, 'right')
+#    fingered_notes = session.fingering()
+#
+#    changes = session.replace(10, [60, 64])
+#    changes = session.insert(20, 67)
+#    changes = session.delete(5)
+#
+# The scores (relative to the best one of each layer, see 'fingering.relaxLayers()')
+# and the best previous nodes of each layer are kept. After an edit, the layers
+# are relaxed again from the edited note, until the scores of a layer are exactly
+# the same than before: the following layers don't change. Then the best path is
+# walked backward from that layer, until it joins the previous best path. Only
+# the fingerings that changed are returned.
+#
+# The results are always the same than the ones of a computation from scratch
+# with relative scores. They can only differ from the ones of 'computeFingering()'
+# between fingerings whose costs are equal up to the rounding.
+
+
+from .fingering import NotesInfo
+from .fingering import bestNode
+from .fingering import layerOptions
+from .fingering import preprocessEntry
+from .fingering import relaxLayers
+
+
+#----------------------------------------------------------
+
+
+class FingeringSession(object):
+    """Fingering of a list of MIDI notes, kept up to date after each edit
+
+    See 'computeFingering()' for the formats of the notes. 'insert()', 'delete()'
+    and 'replace()' return the list of (index, fingered notes) tuples of the
+    notes whose fingering changed (including the inserted or replaced ones), the
+    indices being the ones after the edit.
+
+    'relaxed_layers' is the number of layers whose scores were computed again by
+    the last operation.
+    """
+
+    def __init__(self, notes, left_or_right):
+        self.left_or_right = left_or_right
+        self.relaxed_layers = 0
+
+        # For each element: its NotesInfo (None for the rests), the scores and
+        # the best previous nodes of its layer, and its node on the best path
+        self.infos = [ preprocessEntry(entry) for entry in notes ]
+        self.scores = [ None ] * len(self.infos)
+        self.backpointers = [ None ] * len(self.infos)
+        self.path = [ None ] * len(self.infos)
+
+        self._update(0)
+
+    def __len__(self):
+        return len(self.infos)
+
+    def fingering(self):
+        """Return the fingered notes, in the format returned by 'computeFingering()'"""
+        return [ self._fingeredNotes(index) for index in range(0, len(self.infos)) ]
+
+    def insert(self, index, entry):
+        """Insert an element before the provided index"""
+        index = self._checkIndex(index, len(self.infos) + 1)
+
+        self.infos.insert(index, preprocessEntry(entry))
+        self.scores.insert(index, None)
+        self.backpointers.insert(index, None)
+        self.path.insert(index, None)
+
+        return self._update(index, index)
+
+    def delete(self, index):
+        """Delete the element at the provided index"""
+        index = self._checkIndex(index, len(self.infos))
+
+        del self.infos[index]
+        del self.scores[index]
+        del self.backpointers[index]
+        del self.path[index]
+
+        return self._update(index)
+
+    def replace(self, index, entry):
+        """Replace the element at the provided index"""
+        index = self._checkIndex(index, len(self.infos))
+
+        self.infos[index] = preprocessEntry(entry)
+        self.scores[index] = None
+        self.backpointers[index] = None
+        self.path[index] = None
+
+        return self._update(index, index)
+
+    def _checkIndex(self, index, length):
+        if index < 0:
+            index += length
+
+        if not (0 <= index < length):
+            raise IndexError('Invalid index: %d' % index)
+
+        return index
+
+    def _previousLayer(self, index):
+        """Return the index of the last note (not a rest) before the provided index,
+        or -1
+        """
+        index -= 1
+        while (index >= 0) and (self.infos[index] is None):
+            index -= 1
+
+        return index
+
+    def _update(self, start, edited=None):
+        """Relax the layers from the provided index until the scores are the same
+        than before, then update the best path. 'edited' is the index of the
+        inserted or replaced element, if any.
+
+        Returns the changes (see 'FingeringSession').
+        """
+        previous = self._previousLayer(start)
+        if previous >= 0:
+            scores = self.scores[previous]
+            previous_infos = self.infos[previous]
+        else:
+            scores = [ 0 ]
+            previous_infos = NotesInfo(notes=[], fingers=None)
+
+        # Relax the layers until the scores are the same than before (the scores
+        # of the inserted or replaced layer are None)
+        converged = None
+        self.relaxed_layers = 0
+
+        for index in range(start, len(self.infos)):
+            infos = self.infos[index]
+            if infos is None:
+                continue
+
+            best_previous_nodes = []
+            scores = relaxLayers([ infos ], self.left_or_right, scores, previous_infos,
+                                 best_previous_nodes, relative=True)
+            self.relaxed_layers += 1
+
+            previous_scores = self.scores[index]
+            self.scores[index] = scores
+            self.backpointers[index] = best_previous_nodes[0]
+
+            if scores == previous_scores:
+                converged = index
+                break
+
+            previous_infos = infos
+
+        # Walk the best path backward, until it joins the previous one
+        if converged is not None:
+            index = converged
+            node = self.path[index]
+        else:
+            index = self._previousLayer(len(self.infos))
+            node = bestNode(self.scores[index]) if index >= 0 else None
+
+        changed = set()
+
+        while index >= 0:
+            if (index < start) and (self.path[index] == node):
+                break
+
+            if self.path[index] != node:
+                self.path[index] = node
+                changed.add(index)
+
+            node = self.backpointers[index][node]
+            index = self._previousLayer(index)
+
+        if edited is not None:
+            changed.add(edited)
+
+        return [ (index, self._fingeredNotes(index)) for index in sorted(changed) ]
+
+    def _fingeredNotes(self, index):
+        infos = self.infos[index]
+        if infos is None:
+            return dict(notes=[], fingers=[])
+
+        options = layerOptions(infos.notes, infos.fingers, self.left_or_right)
+        return dict(notes=infos.notes, fingers=options[self.path[index]])
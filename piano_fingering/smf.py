@@ -0,0 +1,399 @@
+# Reading and writing of Standard MIDI Files
+#
+# Use it by calling:
+#
+#    for entry in iterMidiNotes('piece.mid'):
+#        ...
+#
+# The elements are in the formats accepted by 'computeFingering()' (single
+# notes, chords and rests), so they can be given directly to the fingering
+# algorithm. To save the fingering in a copy of the file, as lyrics (or text)
+# events:
+#
+#    annotateMidi('piece.mid', 'fingered.mid', 'right')
+#
+# The file is read one chunk at a time: only the chunk of the track being
+# processed is kept in memory (as bytes), and its events are decoded on the fly.
+
+
+from collections import namedtuple
+from contextlib import contextmanager
+import io
+import struct
+from .streaming import iterFingering
+
+
+#----------------------------------------------------------
+
+
+HEADER_CHUNK = struct.Struct('>4sI')
+HEADER = struct.Struct('>HHH')
+
+META_TEXT = 0x01
+META_LYRIC = 0x05
+META_END_OF_TRACK = 0x2F
+
+META_TYPES = {
+    'text': META_TEXT,
+    'lyric': META_LYRIC,
+}
+
+# Number of data bytes of the channel messages, indexed by (status >> 4) - 8
+CHANNEL_DATA_LENGTHS = (2, 2, 2, 2, 1, 1, 2)
+
+
+MidiHeader = namedtuple('MidiHeader', ['format', 'nb_tracks', 'division'])
+
+
+#----------------------------------------------------------
+
+
+def iterMidiNotes(source, track=None, channels=None):
+    """Yield the notes of a Standard MIDI File, in the formats accepted by
+    'computeFingering()'
+
+    'source' is a filename, a binary file object or a bytes-like object. 'track'
+    is the index of the track to read (by default, the first one with notes),
+    and 'channels' the list of channels to read (by default, all of them).
+
+    The notes starting at the same time are grouped into chords, and a rest is
+    inserted when no note is played between two chords.
+    """
+    for tick, notes in iterMidiChords(source, track, channels):
+        if len(notes) == 1:
+            yield notes[0]
+        else:
+            yield notes
+
+
+def iterMidiChords(source, track=None, channels=None):
+    """Same as 'iterMidiNotes()', but yields (tick, notes) tuples, the notes of
+    the rests being empty lists
+    """
+    with openSource(source) as stream:
+        readHeader(stream)
+
+        for index, data in enumerate(iterTrackChunks(stream)):
+            if (track is not None) and (index != track):
+                continue
+
+            found = False
+            for chord in iterTrackChords(data, channels):
+                found = True
+                yield chord
+
+            if found or (track is not None):
+                return
+
+
+def iterTrackChords(data, channels=None):
+    """Yield the (tick, notes) tuples of the chords and rests of the provided
+    track chunk (see 'iterMidiChords()')
+    """
+    if channels is not None:
+        channels = frozenset(channels)
+
+    chord_tick = None
+    chord = []
+
+    # Notes currently played, and the tick since when no note is played
+    playing = {}
+    silent_since = None
+
+    for tick, status, offset, start in iterTrackEvents(data):
+        kind = status & 0xF0
+        if (kind != 0x90) and (kind != 0x80):
+            continue
+
+        if (channels is not None) and ((status & 0x0F) not in channels):
+            continue
+
+        note = data[offset]
+        key = ((status & 0x0F) << 7) | note
+
+        if (kind == 0x90) and (data[offset + 1] > 0):
+            if tick != chord_tick:
+                if len(chord) > 0:
+                    chord.sort()
+                    yield chord_tick, chord
+                    chord = []
+
+                if (len(playing) == 0) and (silent_since is not None) and (silent_since < tick):
+                    yield silent_since, []
+
+                chord_tick = tick
+
+            chord.append(note)
+            playing[key] = playing.get(key, 0) + 1
+            silent_since = None
+
+        elif key in playing:
+            if playing[key] > 1:
+                playing[key] -= 1
+            else:
+                del playing[key]
+                if len(playing) == 0:
+                    silent_since = tick
+
+    if len(chord) > 0:
+        chord.sort()
+        yield chord_tick, chord
+
+
+#----------------------------------------------------------
+
+
+def annotateMidi(source, destination, left_or_right, track=None, channels=None, meta='lyric',
+                 lag=None):
+    """Compute the fingering of a track of a Standard MIDI File, and save it in
+    a copy of the file (see 'writeMidiFingering()')
+
+    'source' must be a filename or a bytes-like object, since it is read twice.
+    See 'iterFingering()' for 'lag': by default, the results are the same than
+    the ones of 'computeFingering()'.
+    """
+    fingered_notes = iterFingering(iterMidiNotes(source, track, channels), left_or_right, lag=lag)
+    writeMidiFingering(source, destination, fingered_notes, track, channels, meta)
+
+
+def writeMidiFingering(source, destination, fingered_notes, track=None, channels=None,
+                       meta='lyric'):
+    """Copy a Standard MIDI File, adding the provided fingering (in the format
+    returned by 'computeFingering()') as lyrics or text events ('meta' is
+    'lyric' or 'text')
+
+    The fingering must be the one of the notes returned by 'iterMidiNotes()' with
+    the same 'track' and 'channels'. The fingers of each chord are written from
+    the lowest note to the highest one, separated by '-', in an event just before
+    the first note of the chord. The other tracks are copied as is.
+    """
+    meta_type = META_TYPES[meta]
+    fingered_notes = iter(fingered_notes)
+
+    with openSource(source) as stream, openDestination(destination) as output:
+        header = readHeader(stream)
+        output.write(HEADER_CHUNK.pack(b'MThd', HEADER.size))
+        output.write(HEADER.pack(*header))
+
+        annotated = False
+
+        for index, data in enumerate(iterTrackChunks(stream)):
+            if not annotated and ((track is None) or (index == track)):
+                data, annotated = annotateTrack(data, fingered_notes, channels, meta_type)
+                annotated = annotated or (track is not None)
+
+            output.write(HEADER_CHUNK.pack(b'MTrk', len(data)))
+            output.write(data)
+
+
+def annotateTrack(data, fingered_notes, channels, meta_type):
+    """Return the content of the provided track chunk, with the fingering of each
+    chord inserted as a meta event, and whether the track contained any chord
+    """
+    if channels is not None:
+        channels = frozenset(channels)
+
+    result = bytearray()
+    copied = 0
+    chord_tick = None
+    previous_tick = 0
+
+    for tick, status, offset, start in iterTrackEvents(data):
+        event_tick = previous_tick
+        previous_tick = tick
+
+        if ((status & 0xF0) != 0x90) or (tick == chord_tick) or (data[offset + 1] == 0) or \
+           ((channels is not None) and ((status & 0x0F) not in channels)):
+            continue
+
+        # First note of a chord: copy the previous events as is, then the meta event
+        # (using the delta time of the note), and the note with its status (the
+        # meta event cancels the running status)
+        entry = nextFingeredNotes(fingered_notes)
+
+        fingers = [ finger for note, finger in sorted(zip(entry['notes'], entry['fingers'])) ]
+        text = '-'.join([ str(finger) for finger in fingers ]).encode('ascii')
+
+        result.extend(data[copied:start])
+
+        writeVariableLength(result, tick - event_tick)
+        result.extend((0xFF, meta_type))
+        writeVariableLength(result, len(text))
+        result.extend(text)
+
+        result.extend((0, status))
+        result.extend(data[offset:offset + 2])
+
+        copied = offset + 2
+        chord_tick = tick
+
+    if chord_tick is None:
+        return data, False
+
+    result.extend(data[copied:])
+    return bytes(result), True
+
+
+#----------------------------------------------------------
+
+
+def readHeader(stream):
+    """Read the header chunk of a Standard MIDI File, and return a MidiHeader"""
+    chunk_header = stream.read(HEADER_CHUNK.size)
+    if len(chunk_header) < HEADER_CHUNK.size:
+        raise ValueError('Invalid MIDI file: truncated header')
+
+    chunk_type, length = HEADER_CHUNK.unpack(chunk_header)
+    if (chunk_type != b'MThd') or (length < HEADER.size):
+        raise ValueError('Invalid MIDI file: no header chunk')
+
+    content = stream.read(length)
+    if len(content) < length:
+        raise ValueError('Invalid MIDI file: truncated header')
+
+    return MidiHeader(*HEADER.unpack_from(content, 0))
+
+
+def iterTrackChunks(stream):
+    """Yield the content of each track chunk of the stream (the other chunks are
+    ignored), reading one chunk at a time
+    """
+    while True:
+        chunk_header = stream.read(HEADER_CHUNK.size)
+        if len(chunk_header) < HEADER_CHUNK.size:
+            return
+
+        chunk_type, length = HEADER_CHUNK.unpack(chunk_header)
+        data = stream.read(length)
+
+        if len(data) < length:
+            raise ValueError('Invalid MIDI file: truncated chunk')
+
+        if chunk_type == b'MTrk':
+            yield data
+
+
+def iterTrackEvents(data):
+    """Yield a (tick, status, offset, start) tuple for each event of a track chunk,
+    the offset being the one of the data of the event (after the running status,
+    or the type of the meta events), the start the one of its delta time, and the
+    tick being absolute
+
+    A ValueError is raised if an event is cut off by the end of the chunk.
+    """
+    position = 0
+    length = len(data)
+    tick = 0
+    running_status = 0
+
+    while position < length:
+        start = position
+
+        # Delta time
+        delta = 0
+        byte = 0x80
+        while byte & 0x80:
+            if position >= length:
+                raise ValueError('Invalid MIDI file: truncated event')
+
+            byte = data[position]
+            position += 1
+            delta = (delta << 7) | (byte & 0x7F)
+
+        tick += delta
+
+        if position >= length:
+            raise ValueError('Invalid MIDI file: truncated event')
+
+        status = data[position]
+        if status & 0x80:
+            position += 1
+        elif running_status:
+            status = running_status
+        else:
+            raise ValueError('Invalid MIDI file: no running status')
+
+        if status < 0xF0:
+            running_status = status
+            if position + CHANNEL_DATA_LENGTHS[(status >> 4) - 8] > length:
+                raise ValueError('Invalid MIDI file: truncated event')
+
+            yield tick, status, position, start
+            position += CHANNEL_DATA_LENGTHS[(status >> 4) - 8]
+            continue
+
+        # Meta and system exclusive events cancel the running status
+        running_status = 0
+        offset = position
+        if status == 0xFF:
+            position += 1
+
+        size = 0
+        byte = 0x80
+        while byte & 0x80:
+            if position >= length:
+                raise ValueError('Invalid MIDI file: truncated event')
+
+            byte = data[position]
+            position += 1
+            size = (size << 7) | (byte & 0x7F)
+
+        if position + size > length:
+            raise ValueError('Invalid MIDI file: truncated event')
+
+        yield tick, status, offset, start
+        position += size
+
+        if (status == 0xFF) and (data[offset] == META_END_OF_TRACK):
+            return
+
+
+def writeVariableLength(output, value):
+    """Append the provided value to a bytearray, as a variable-length quantity"""
+    buffer = [ value & 0x7F ]
+    value >>= 7
+
+    while value > 0:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+
+    buffer.reverse()
+    output.extend(buffer)
+
+
+#----------------------------------------------------------
+
+
+def nextFingeredNotes(fingered_notes):
+    """Return the next entry of the fingering (skipping the rests), or raise a
+    ValueError if there is none left
+    """
+    for entry in fingered_notes:
+        if len(entry['notes']) > 0:
+            return entry
+
+    raise ValueError('The fingering does not match the notes')
+
+
+@contextmanager
+def openSource(source):
+    """Return a binary stream reading the provided filename, file object or
+    bytes-like object (only the streams opened here are closed)
+    """
+    if hasattr(source, 'read'):
+        yield source
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    else:
+        with open(source, 'rb') as stream:
+            yield stream
+
+
+@contextmanager
+def openDestination(destination):
+    """Same as 'openSource()', for writing to a filename or a file object"""
+    if hasattr(destination, 'write'):
+        yield destination
+    else:
+        with open(destination, 'wb') as stream:
+            yield stream
@@ -0,0 +1,347 @@
+# Persistent storage of the cost tables
+#
+# The cost tables are deterministic, so instead of computing them in every
+# process, they are saved once in a binary file in the user cache directory
+# and memory-mapped by the later processes (which thus share the same pages
+# through the OS page cache).
+#
+# Use it by calling:
+#
+#    right_hand_cost_table, left_hand_cost_table = loadOrCreateCostTables()
+#
+# The file starts with a hash of the cost parameters: if any of them changed,
+# the tables are computed and saved again.
+#
+# The same content can also be published in a block of shared memory, to which
+# other processes attach without any copy:
+#
+#    block = publishCostTables(right_hand_cost_table, left_hand_cost_table)
+#
+#    # In the other processes
+#    right_hand_cost_table, left_hand_cost_table = attachCostTables(block.name)
+#    ...
+#    detachCostTables(block.name)
+#
+#    # Once all the processes are done
+#    unpublishCostTables(block)
+
+
+import os
+import struct
+import sys
+from . import cost
+from .cost import CostTable
+from .cost import MirroredCostTable
+from .cost import NB_FINGERS
+from .cost import createCostTables
+
+
+#----------------------------------------------------------
+
+
+# Must be incremented each time the layout of the file or the cost formulas
+# themselves change
+FORMAT_VERSION = 2
+
+MAGIC = b'PFCT'
+
+# Magic, format version, parameters hash, max interval, number of values per
+# table, and padding to keep the values aligned
+HEADER = struct.Struct('<4sI20sIII')
+
+NB_TAIL_OFFSETS = 2 * NB_FINGERS * NB_FINGERS
+
+NB_UNISONS = 12 * NB_FINGERS * NB_FINGERS
+
+
+#----------------------------------------------------------
+
+
+def costParametersHash():
+    """Return a hash (SHA-1 digest) of all the parameters of the cost functions"""
+    import hashlib
+
+    parameters = [
+        FORMAT_VERSION,
+        sys.byteorder,
+        cost.MOVE_CUTOFF,
+        sorted(cost.FINGER_DISTANCE.items()),
+        sorted(cost.MOVE_HASH.items()),
+        sorted(cost.COLOR.items()),
+        sorted(cost.DESC_THUMB_STRETCH_VALS.items()),
+        sorted(cost.ASC_THUMB_STRETCH_VALS.items()),
+        sorted(cost.FINGER_STRETCH.items()),
+    ]
+
+    return hashlib.sha1(repr(parameters).encode('utf-8')).digest()
+
+
+#----------------------------------------------------------
+
+
+def defaultCacheDirectory():
+    """Return the directory in which the cost tables are cached
+
+    It can be changed with the PIANO_FINGERING_CACHE_DIR environment variable.
+    Setting it to an empty string disables the cache.
+    """
+    directory = os.environ.get('PIANO_FINGERING_CACHE_DIR')
+    if directory is not None:
+        return directory or None
+
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'piano_fingering')
+
+
+def cacheFilename(directory, version=FORMAT_VERSION):
+    return os.path.join(directory, 'cost_tables-v%d.bin' % version)
+
+
+def removeOutdatedCostTables(directory):
+    """Remove the files of the cache directory saved with other versions of the
+    format (see 'FORMAT_VERSION')
+    """
+    try:
+        filenames = os.listdir(directory)
+    except OSError:
+        return
+
+    current = os.path.basename(cacheFilename(directory))
+
+    for filename in filenames:
+        if (filename == current) or not filename.startswith('cost_tables-v') or \
+           not filename.endswith('.bin') or not filename[13:-4].isdigit():
+            continue
+
+        try:
+            os.remove(os.path.join(directory, filename))
+        except OSError:
+            pass
+
+
+#----------------------------------------------------------
+
+
+def serializeCostTables(right_hand_cost_table, left_hand_cost_table):
+    """Return the content of a cost tables file, as bytes
+
+    The table of the left hand must use the one of the right hand (see
+    'cost.MirroredCostTable'): only its costs of the repeated notes are saved.
+    """
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, costParametersHash(),
+                         right_hand_cost_table.max_interval,
+                         len(right_hand_cost_table.values), 0)
+
+    return b''.join([ header,
+                      memoryview(right_hand_cost_table.values).tobytes(),
+                      memoryview(right_hand_cost_table.tail_offsets).tobytes(),
+                      memoryview(left_hand_cost_table.unisons).tobytes() ])
+
+
+def serializedSize(nb_values):
+    """Return the size of the content of a cost tables file, for tables with the
+    provided number of values
+    """
+    return HEADER.size + (nb_values + NB_TAIL_OFFSETS + NB_UNISONS) * 8
+
+
+def deserializeCostTables(buffer):
+    """Return the cost tables stored in the provided buffer (bytes, mmap, ...)
+
+    The tables directly use the memory of the buffer, no copy is done. Raises
+    a ValueError if the buffer doesn't contain up-to-date cost tables.
+    """
+    if len(buffer) < HEADER.size:
+        raise ValueError('Invalid cost tables: truncated header')
+
+    magic, version, parameters_hash, max_interval, nb_values, _ = HEADER.unpack_from(buffer, 0)
+
+    if (magic != MAGIC) or (version != FORMAT_VERSION):
+        raise ValueError('Invalid cost tables: unknown format')
+
+    if parameters_hash != costParametersHash():
+        raise ValueError('Invalid cost tables: computed with different parameters')
+
+    if len(buffer) != serializedSize(nb_values):
+        raise ValueError('Invalid cost tables: wrong size')
+
+    view = memoryview(buffer)
+
+    offset = HEADER.size
+    values = view[offset:offset + nb_values * 8].cast('d')
+
+    offset += nb_values * 8
+    tail_offsets = view[offset:offset + NB_TAIL_OFFSETS * 8].cast('d')
+
+    offset += NB_TAIL_OFFSETS * 8
+    unisons = view[offset:offset + NB_UNISONS * 8].cast('d')
+
+    right_hand_cost_table = CostTable(values, tail_offsets, max_interval)
+
+    return right_hand_cost_table, MirroredCostTable(right_hand_cost_table, unisons)
+
+
+#----------------------------------------------------------
+
+
+def saveCostTables(filename, right_hand_cost_table, left_hand_cost_table):
+    """Save the cost tables in the provided file
+
+    The file is replaced atomically, so processes reading it concurrently never
+    see a partially written file.
+    """
+    import tempfile
+
+    directory = os.path.dirname(filename) or '.'
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    fd, temp_filename = tempfile.mkstemp(dir=directory, prefix='.cost_tables-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(serializeCostTables(right_hand_cost_table, left_hand_cost_table))
+        os.replace(temp_filename, filename)
+    except:
+        os.remove(temp_filename)
+        raise
+
+
+def loadCostTables(filename):
+    """Memory-map the cost tables saved in the provided file
+
+    Raises an OSError if the file can't be read, or a ValueError if it doesn't
+    contain up-to-date cost tables.
+    """
+    import mmap
+
+    with open(filename, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        return deserializeCostTables(buffer)
+    except ValueError:
+        buffer.close()
+        raise
+
+
+def loadOrCreateCostTables(directory=None):
+    """Return the cost tables saved in the cache directory, or compute (and save)
+    them if they are missing or out-of-date
+
+    'directory' defaults to the one returned by 'defaultCacheDirectory()'. If the
+    cache is disabled or can't be written, the tables are just computed. When
+    the tables are saved, the files of the other versions of the format are
+    removed.
+    """
+    if directory is None:
+        directory = defaultCacheDirectory()
+        if directory is None:
+            return createCostTables()
+
+    filename = cacheFilename(directory)
+
+    try:
+        return loadCostTables(filename)
+    except (OSError, IOError, ValueError):
+        pass
+
+    right_hand_cost_table, left_hand_cost_table = createCostTables()
+
+    try:
+        saveCostTables(filename, right_hand_cost_table, left_hand_cost_table)
+        tables = loadCostTables(filename)
+    except (OSError, IOError, ValueError):
+        return right_hand_cost_table, left_hand_cost_table
+
+    # The files of the previous versions will never be used again
+    removeOutdatedCostTables(directory)
+
+    return tables
+
+
+#----------------------------------------------------------
+
+
+# Blocks of shared memory attached by this process, by name
+ATTACHED_BLOCKS = {}
+
+
+def publishCostTables(right_hand_cost_table, left_hand_cost_table, name=None):
+    """Copy the cost tables in a new block of shared memory, and return it (a
+    'multiprocessing.shared_memory.SharedMemory' object)
+
+    Other processes can use the tables with 'attachCostTables(block.name)'. The
+    block must be removed with 'unpublishCostTables()' once they are done.
+    """
+    from multiprocessing import shared_memory
+
+    content = serializeCostTables(right_hand_cost_table, left_hand_cost_table)
+
+    block = shared_memory.SharedMemory(name=name, create=True, size=len(content))
+    block.buf[:len(content)] = content
+
+    return block
+
+
+def unpublishCostTables(block):
+    """Remove a block of shared memory created by 'publishCostTables()'"""
+    block.close()
+    block.unlink()
+
+
+def attachCostTables(name):
+    """Return the cost tables published in the block of shared memory with the
+    provided name (see 'publishCostTables()')
+
+    The tables are read-only, and directly use the shared memory. Raises a
+    ValueError if the block doesn't contain up-to-date cost tables.
+
+    Before Python 3.13, the block is removed when the process exits, unless it is
+    a child of the process that published the tables (like the processes of a
+    'multiprocessing' pool).
+    """
+    from multiprocessing import shared_memory
+
+    block = ATTACHED_BLOCKS.get(name)
+    if block is None:
+        try:
+            block = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            block = shared_memory.SharedMemory(name=name)
+
+    view = block.buf.toreadonly()
+
+    try:
+        if len(view) < HEADER.size:
+            raise ValueError('Invalid cost tables: truncated header')
+
+        nb_values = HEADER.unpack_from(view, 0)[4]
+
+        # The size of the block may have been rounded up
+        content = view[:serializedSize(nb_values)]
+        try:
+            tables = deserializeCostTables(content)
+        except ValueError:
+            content.release()
+            raise
+    except ValueError:
+        view.release()
+        if name not in ATTACHED_BLOCKS:
+            block.close()
+        raise
+
+    ATTACHED_BLOCKS[name] = block
+
+    return tables
+
+
+def detachCostTables(name):
+    """Detach this process from a block of shared memory attached by
+    'attachCostTables()'
+
+    All the references to the tables returned by 'attachCostTables()' must have
+    been released before.
+    """
+    block = ATTACHED_BLOCKS.pop(name, None)
+    if block is not None:
+        block.close()
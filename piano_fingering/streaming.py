@@ -0,0 +1,185 @@
+# Streaming version of the fingering algorithm
+#
+# Use it by calling:
+#
+#    for fingered_notes in iterFingering(notes, 'right'):
+#        ...
+#
+# 'notes' can be any iterable (a generator reading a file, a MIDI keyboard, ...)
+# yielding elements in the formats accepted by 'computeFingering()'. The fingered
+# notes are yielded, in order, as soon as their fingering is known.
+#
+# The best path to each fingering option of the last note is known at any time.
+# When all those paths share the same fingering for an older note, that
+# fingering (and the ones of the notes before it) can't change anymore, and is
+# emitted: the results are then the same than the ones of 'computeFingering()'.
+#
+# To keep the memory and latency bounded, the fingering of a note is also
+# emitted when 'lag' notes have been received after it, using the best path at
+# that time. The paths not going through that fingering are then discarded.
+
+
+from collections import deque
+from .fingering import NotesInfo
+from .fingering import bestNode
+from .fingering import layerOptions
+from .fingering import preprocessEntry
+from .fingering import relaxLayers
+
+
+#----------------------------------------------------------
+
+
+DEFAULT_LAG = 32
+
+
+#----------------------------------------------------------
+
+
+def iterFingering(notes, left_or_right, lag=DEFAULT_LAG):
+    """Compute the best fingering of the provided iterable of MIDI notes, yielding
+    the fingered notes as soon as possible
+
+    See 'computeFingering()' for a description of the formats of the notes, and
+    'FingeringDecoder' for a description of 'lag'.
+    """
+    decoder = FingeringDecoder(left_or_right, lag=lag)
+
+    for entry in notes:
+        for fingered_notes in decoder.push(entry):
+            yield fingered_notes
+
+    for fingered_notes in decoder.flush():
+        yield fingered_notes
+
+
+#----------------------------------------------------------
+
+
+class FingeringDecoder(object):
+    """Incremental computation of the best fingering of a sequence of notes
+
+    'push()' adds an element (in the formats accepted by 'computeFingering()')
+    and returns the list of fingered notes that are now known, and 'flush()'
+    returns the remaining ones once all the elements were pushed.
+
+    The fingering of a note is known when all the best paths to the fingering
+    options of the last note agree on it. If 'lag' isn't None, it is also decided
+    once 'lag' notes have been pushed after it, using the best path at that time.
+    With 'lag=None', the results are always the same than the ones of
+    'computeFingering()', but the memory isn't bounded anymore.
+    """
+
+    def __init__(self, left_or_right, lag=DEFAULT_LAG):
+        if (lag is not None) and (lag < 0):
+            raise ValueError('Invalid lag: %d' % lag)
+
+        self.left_or_right = left_or_right
+        self.lag = lag
+
+        # Pending notes (NotesInfo) and number of rests, in order
+        self.queue = deque()
+
+        # Infos and best previous nodes of each pending layer
+        self.layers = deque()
+
+        # Scores of the nodes of the last layer
+        self.scores = [ 0 ]
+        self.previous_infos = NotesInfo(notes=[], fingers=None)
+
+    def push(self, entry):
+        infos = preprocessEntry(entry)
+
+        if infos is None:
+            if len(self.queue) == 0:
+                return [ dict(notes=[], fingers=[]) ]
+
+            if isinstance(self.queue[-1], int):
+                self.queue[-1] += 1
+            else:
+                self.queue.append(1)
+
+            return []
+
+        best_previous_nodes = []
+        self.scores = relaxLayers([ infos ], self.left_or_right, self.scores, self.previous_infos,
+                                  best_previous_nodes)
+        self.previous_infos = infos
+
+        self.queue.append(infos)
+        self.layers.append(best_previous_nodes[0])
+
+        result = []
+
+        # Emit the layers on which all the best paths agree
+        nodes = set([ i for i, score in enumerate(self.scores) if score != float('inf') ])
+        position = len(self.layers) - 1
+
+        while (len(nodes) > 1) and (position > 0):
+            best_previous_nodes = self.layers[position]
+            nodes = set([ best_previous_nodes[node] for node in nodes ])
+            position -= 1
+
+        if len(nodes) == 1:
+            self._emit(position + 1, nodes.pop(), result)
+
+        # Emit the oldest layers if the lag is reached
+        if (self.lag is not None) and (len(self.layers) > self.lag):
+            nb_layers = len(self.layers) - self.lag
+
+            node = self._ancestors([ bestNode(self.scores) ], nb_layers - 1)[0]
+            self._emit(nb_layers, node, result)
+
+            # Discard the paths not going through that node
+            ancestors = self._ancestors(range(0, len(self.scores)), -1)
+            self.scores = [ score if ancestor == node else float('inf')
+                            for score, ancestor in zip(self.scores, ancestors) ]
+
+        return result
+
+    def flush(self):
+        result = []
+
+        if len(self.layers) > 0:
+            self._emit(len(self.layers), bestNode(self.scores), result)
+
+        self._emitRests(result)
+
+        return result
+
+    def _ancestors(self, nodes, position):
+        """Return the nodes of the layer at the provided position (-1 being the last
+        emitted layer) on the best paths to the provided nodes of the last layer
+        """
+        nodes = list(nodes)
+
+        for index in range(len(self.layers) - 1, position, -1):
+            best_previous_nodes = self.layers[index]
+            nodes = [ best_previous_nodes[node] for node in nodes ]
+
+        return nodes
+
+    def _emit(self, nb_layers, node, result):
+        """Append to 'result' the first 'nb_layers' pending layers, the last of them
+        using the provided node, and the rests following them
+        """
+        nodes = [ node ]
+        for index in range(nb_layers - 1, 0, -1):
+            nodes.append(self.layers[index][nodes[-1]])
+
+        nodes.reverse()
+
+        for node in nodes:
+            self._emitRests(result)
+
+            infos = self.queue.popleft()
+            self.layers.popleft()
+
+            options = layerOptions(infos.notes, infos.fingers, self.left_or_right)
+            result.append(dict(notes=infos.notes, fingers=options[node]))
+
+        self._emitRests(result)
+
+    def _emitRests(self, result):
+        while (len(self.queue) > 0) and isinstance(self.queue[0], int):
+            result.extend([ dict(notes=[], fingers=[]) for i in range(self.queue.popleft()) ])
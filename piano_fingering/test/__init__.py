@@ -0,0 +1,12 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+
+# The tests (and the processes they start) must not use the cost tables cached in
+# the directory of the user, nor save them there
+CACHE_DIRECTORY = tempfile.mkdtemp(prefix='piano_fingering-tests-')
+os.environ['PIANO_FINGERING_CACHE_DIR'] = CACHE_DIRECTORY
+
+atexit.register(shutil.rmtree, CACHE_DIRECTORY, True)
@@ -0,0 +1,201 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from ..cache import LRUCache
+from ..cache import PhraseCache
+from ..cache import phraseKey
+from ..cache import transitionKey
+from ..fingering import TRANSITION_MATRICES
+from ..fingering import computeFingering
+from .test_vectorized import randomNotes
+
+
+class TestLRUCache(TestCase):
+
+    def test_hits_and_misses(self):
+        cache = LRUCache(maxsize=2)
+        self.assertEqual(None, cache.get('a'))
+
+        cache.put('a', 1)
+        self.assertEqual(1, cache.get('a'))
+
+        stats = cache.stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+        self.assertEqual(0.5, stats['hit_rate'])
+        self.assertEqual(1, stats['size'])
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertTrue('c' in cache)
+        self.assertEqual(1, cache.stats()['evictions'])
+
+    def test_resize(self):
+        cache = LRUCache(maxsize=3)
+        for i in range(3):
+            cache.put(i, i)
+
+        cache.resize(1)
+        self.assertEqual(1, len(cache))
+        self.assertTrue(2 in cache)
+
+    def test_disabled(self):
+        cache = LRUCache(maxsize=0)
+        cache.put('a', 1)
+        self.assertEqual(0, len(cache))
+        self.assertEqual(None, cache.get('a'))
+
+
+#----------------------------------------------------------
+
+
+class TestTransitionKeys(TestCase):
+
+    def test_transposition(self):
+        # C-E to D-F#: same intervals, same colors
+        self.assertEqual(transitionKey('right', [60], None, [64], None),
+                         transitionKey('right', [67], None, [71], None))
+
+        self.assertEqual(transitionKey('right', [60, 64], None, [62, 65, 69], None),
+                         transitionKey('right', [72, 76], None, [74, 77, 81], None))
+
+    def test_colors(self):
+        # C-E vs D-F#
+        self.assertNotEqual(transitionKey('right', [60], None, [64], None),
+                            transitionKey('right', [62], None, [66], None))
+
+    def test_fingers_and_hand(self):
+        self.assertNotEqual(transitionKey('right', [60], None, [64], None),
+                            transitionKey('right', [60], None, [64], [3]))
+        self.assertNotEqual(transitionKey('right', [60], None, [64], None),
+                            transitionKey('left', [60], None, [64], None))
+
+    def test_first_layer(self):
+        self.assertEqual(transitionKey('right', [], None, [60, 64], None),
+                         transitionKey('right', [], None, [72, 76], None))
+
+
+#----------------------------------------------------------
+
+
+class TestTransitionMatrices(TestCase):
+
+    def tearDown(self):
+        TRANSITION_MATRICES.resize(4096)
+
+    def test_same_results_without_cache(self):
+        engines = [ 'python' ]
+        try:
+            import numpy
+            engines.append('numpy')
+        except ImportError:
+            pass
+
+        for seed in range(5):
+            notes = randomNotes(300, seed)
+
+            for engine in engines:
+                TRANSITION_MATRICES.resize(0)
+                expected = computeFingering(notes, 'right', engine=engine)
+
+                TRANSITION_MATRICES.resize(16)
+                self.assertEqual(expected, computeFingering(notes, 'right', engine=engine))
+                self.assertEqual(expected, computeFingering(notes, 'right', engine=engine))
+
+    def test_repeated_transitions_are_cached(self):
+        TRANSITION_MATRICES.clear()
+        TRANSITION_MATRICES.resetStats()
+
+        computeFingering([60, 64, 67, 72, 62, 66, 69, 74] * 10, 'right')
+
+        stats = TRANSITION_MATRICES.stats()
+        self.assertEqual(80, stats['hits'] + stats['misses'])
+        self.assertTrue(stats['misses'] <= 16)
+
+
+class TestPhraseCache(TestCase):
+
+    def test_phrase_keys(self):
+        notes = [ 60, [62, 65], [], dict(notes=[64], fingers=[3]) ]
+        transposed = [ 72, [74, 77], [], dict(notes=[76], fingers=[3]) ]
+
+        self.assertEqual(phraseKey('right', notes), phraseKey('right', transposed))
+        self.assertNotEqual(phraseKey('right', notes), phraseKey('left', notes))
+        self.assertNotEqual(phraseKey('right', notes), phraseKey('right', notes, beam=3))
+        self.assertNotEqual(phraseKey('right', notes), phraseKey('right', [ 61, [63, 66], [], 65 ]))
+
+    def test_empty_groups(self):
+        # The rests returned by computeFingering() can be given back as input
+        notes = [ dict(notes=[], fingers=[]), 60, dict(notes=[], fingers=[]), [64, 67], [], 62 ]
+        self.assertNotEqual(phraseKey('right', notes),
+                            phraseKey('right', [ [], 60, [], [64, 67], [], 62 ]))
+
+        cache = PhraseCache()
+        for left_or_right in ('right', 'left'):
+            expected = computeFingering(notes, left_or_right)
+            self.assertEqual(expected, cache.computeFingering(notes, left_or_right))
+            self.assertEqual(expected, cache.computeFingering(notes, left_or_right))
+
+        self.assertEqual(2, cache.stats()['hits'])
+
+    def test_same_results_than_computeFingering(self):
+        cache = PhraseCache()
+
+        for seed in range(5):
+            notes = randomNotes(200, seed)
+
+            for offset in (0, 12, -24, 5, 7):
+                transposed = [ self.transpose(entry, offset) for entry in notes ]
+
+                for left_or_right in ('right', 'left'):
+                    self.assertEqual(computeFingering(transposed, left_or_right),
+                                     cache.computeFingering(transposed, left_or_right))
+
+        self.assertGreater(cache.stats()['hits'], 0)
+
+    def test_hits_and_misses(self):
+        cache = PhraseCache(maxsize=1)
+        cache.computeFingering([ 60, 62, 64 ], 'right')
+        cache.computeFingering([ 72, 74, 76 ], 'right')
+        cache.computeFingering([ 60, 61 ], 'right')
+
+        stats = cache.stats()
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(2, stats['misses'])
+        self.assertEqual(1, stats['evictions'])
+
+    def test_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        filename = os.path.join(directory, 'phrases')
+
+        notes = randomNotes(100, 0)
+
+        with PhraseCache(filename=filename) as cache:
+            expected = cache.computeFingering(notes, 'right')
+            self.assertEqual(1, cache.stats()['file_misses'])
+
+        with PhraseCache(filename=filename) as cache:
+            self.assertEqual(expected, cache.computeFingering(notes, 'right'))
+            self.assertEqual(1, cache.stats()['file_hits'])
+
+            cache.clear()
+            cache.entries.clear()
+            cache.computeFingering(notes, 'right')
+            self.assertEqual(1, cache.stats()['file_misses'])
+
+    def transpose(self, entry, offset):
+        if isinstance(entry, list):
+            return [ note + offset for note in entry ]
+        elif isinstance(entry, dict):
+            return dict(notes=[ note + offset for note in entry['notes'] ], fingers=entry['fingers'])
+        else:
+            return entry + offset
@@ -1,5 +1,11 @@
 from unittest import TestCase
 from ..cost import createCostDatabase
+from ..cost import createCostTable
+from ..cost import createCostTables
+from ..cost import computeRightHandCost
+from ..cost import computeLeftHandCost
+from ..cost import rightHandCost
+from ..cost import leftHandCost
 
 
 class TestCostDatabases(TestCase):
@@ -8,3 +14,100 @@ class TestCostDatabases(TestCase):
         right_hand_cost_database, left_hand_cost_database = createCostDatabase()
         self.assertEqual(5 * 88 * 5 * 88, len(right_hand_cost_database))
         self.assertEqual(5 * 88 * 5 * 88, len(left_hand_cost_database))
+
+    def test_same_values_than_dictionaries(self):
+        right_hand_cost_database, left_hand_cost_database = createCostDatabase()
+
+        for n1 in range(21, 109, 5):
+            for n2 in range(21, 109):
+                for f1 in range(1, 6):
+                    for f2 in range(1, 6):
+                        expected_right = {}
+                        expected_left = {}
+                        computeRightHandCost(n1, n2, f1, f2, expected_right)
+                        computeLeftHandCost(n1, n2, f1, f2, expected_left)
+
+                        key = '%d,%d,%d,%d' % (n1, n2, f1, f2)
+                        self.assertEqual(expected_right[key], right_hand_cost_database[key])
+                        self.assertEqual(expected_left[key], left_hand_cost_database[key])
+
+    def test_keys(self):
+        right_hand_cost_database, left_hand_cost_database = createCostDatabase()
+
+        keys = set(left_hand_cost_database)
+        self.assertEqual(len(left_hand_cost_database), len(keys))
+        self.assertTrue(all([ key in left_hand_cost_database for key in keys ]))
+        self.assertEqual(keys, set(right_hand_cost_database))
+
+    def test_unknown_keys(self):
+        right_hand_cost_database, left_hand_cost_database = createCostDatabase()
+        self.assertTrue('48,50,1,2' in right_hand_cost_database)
+        self.assertFalse('20,50,1,2' in right_hand_cost_database)
+        self.assertFalse('48,50,0,2' in left_hand_cost_database)
+        self.assertFalse('48,50,-1,2' in left_hand_cost_database)
+        self.assertFalse('invalid' in left_hand_cost_database)
+
+
+#----------------------------------------------------------
+
+
+class TestCostTables(TestCase):
+
+    def test_size(self):
+        right_hand_cost_table, left_hand_cost_table = createCostTables()
+        self.assertEqual(12 * 63 * 5 * 5, len(right_hand_cost_table))
+        self.assertEqual(12 * 63 * 5 * 5 + 12 * 5 * 5, len(left_hand_cost_table))
+
+    def test_same_values_than_cost_functions(self):
+        right_hand_cost_table, left_hand_cost_table = createCostTables()
+
+        for n1 in range(0, 128):
+            for n2 in range(0, 128):
+                for f1 in range(1, 6):
+                    for f2 in range(1, 6):
+                        self.assertEqual(rightHandCost(n1, n2, f1, f2), right_hand_cost_table.cost(n1, n2, f1, f2))
+                        self.assertEqual(leftHandCost(n1, n2, f1, f2), left_hand_cost_table.cost(n1, n2, f1, f2))
+
+    def test_mirrored_left_hand_table(self):
+        # The table of the left hand is the one of the right hand, reflected
+        right_hand_cost_table, left_hand_cost_table = createCostTables()
+        expected = createCostTable('left')
+
+        self.assertIs(right_hand_cost_table, left_hand_cost_table.table)
+
+        for n1 in range(-12, 140):
+            for n2 in range(-12, 140):
+                for f1 in range(1, 6):
+                    for f2 in range(1, 6):
+                        self.assertEqual(expected.cost(n1, n2, f1, f2), left_hand_cost_table.cost(n1, n2, f1, f2))
+
+    def test_lookup(self):
+        right_hand_cost_table, left_hand_cost_table = createCostTables()
+
+        index = right_hand_cost_table.index(48, 50, 1, 2)
+        self.assertEqual(right_hand_cost_table.values[index], right_hand_cost_table.cost(48, 50, 1, 2))
+
+        self.assertRaises(KeyError, right_hand_cost_table.index, 21, 108, 1, 2)
+
+        # Same API for the table of the left hand (which uses the one of the right hand)
+        for n1, n2, f1, f2 in ((48, 50, 1, 2), (50, 48, 3, 1), (60, 60, 2, 4), (60, 60, -2, -4), (21, 40, -1, 5)):
+            index = left_hand_cost_table.index(n1, n2, f1, f2)
+            self.assertEqual(left_hand_cost_table.values[index], left_hand_cost_table.cost(n1, n2, f1, f2))
+
+        self.assertEqual(left_hand_cost_table.unisons[-1], left_hand_cost_table.values[-1])
+        self.assertRaises(KeyError, left_hand_cost_table.index, 21, 108, 1, 2)
+        self.assertRaises(KeyError, left_hand_cost_table.cost, 48, 50, 1, 6)
+        self.assertRaises(KeyError, left_hand_cost_table.cost, 21, 108, 0, 2)
+
+    def test_mirrored_key_errors(self):
+        # The errors show the move of the caller, not the reflected one
+        right_hand_cost_table, left_hand_cost_table = createCostTables()
+
+        for lookup in (left_hand_cost_table.cost, left_hand_cost_table.index):
+            with self.assertRaises(KeyError) as context:
+                lookup(60, 62, -1, 6)
+            self.assertEqual(('60,62,-1,6',), context.exception.args)
+
+            with self.assertRaises(KeyError) as context:
+                lookup(60, 60, 1, 6)
+            self.assertEqual(('60,60,1,6',), context.exception.args)
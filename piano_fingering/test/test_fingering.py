@@ -1,6 +1,20 @@
 from unittest import TestCase
+import subprocess
+import sys
+from .. import fingering
+from ..fingering import Node
+from ..fingering import beamDivergence
+from ..fingering import calcCost
+from ..fingering import calcStateCost
+from ..fingering import calcTransitionCost
 from ..fingering import computeFingering
+from ..fingering import insertRests
+from ..fingering import makeLayer
+from ..fingering import pathCost
+from ..fingering import pruneScores
+from ..fingering import warmup
 from ..midi import listToMidi
+from .test_vectorized import randomNotes
 
 
 class TestFingering(TestCase):
@@ -89,6 +103,25 @@ class TestFingering(TestCase):
 
         self.process(notes, expected, 'left')
 
+    def test_only_rests(self):
+        self.process([[], []], [dict(notes=[], fingers=[]), dict(notes=[], fingers=[])], 'right')
+
+    def test_fingering_as_input(self):
+        # The results (whose rests are dictionaries) can be given back as input
+        notes = [ [], 60, [], [], [64, 67], 62 ]
+
+        for engine in ('python', 'numpy', 'branch_and_bound'):
+            for left_or_right in ('right', 'left'):
+                result = computeFingering(notes, left_or_right, engine=engine)
+                self.assertEqual(result, computeFingering(result, left_or_right, engine=engine))
+                self.assertEqual(result[1:],
+                                 computeFingering(result[1:], left_or_right, engine=engine))
+
+    def test_rests_are_inserted_back(self):
+        self.assertEqual([dict(notes=[], fingers=[]), 'a', dict(notes=[], fingers=[]),
+                          dict(notes=[], fingers=[]), 'b', dict(notes=[], fingers=[])],
+                         insertRests(['a', 'b'], [0, 2, 3, 5]))
+
     def test_chords_right_hand(self):
         notes = [
             [60, 62, 64],
@@ -164,3 +197,168 @@ class TestFingering(TestCase):
         ]
 
         self.process(notes, expected, 'left')
+
+    def test_negative_fingers_left_hand(self):
+        notes = [
+            dict(notes=[60], fingers=[-1]),
+            62,
+            64,
+            dict(notes=[60, 64], fingers=[-5, -3]),
+            62,
+        ]
+
+        expected = [
+            dict(notes=[60], fingers=[-1]),
+            dict(notes=[62], fingers=[2]),
+            dict(notes=[64], fingers=[1]),
+            dict(notes=[60, 64], fingers=[-5, -3]),
+            dict(notes=[62], fingers=[4]),
+        ]
+
+        self.process(notes, expected, 'left')
+
+        self.assertEqual(expected, computeFingering(notes, 'left', engine='branch_and_bound'))
+
+
+#----------------------------------------------------------
+
+
+class TestInitialization(TestCase):
+
+    def test_import_is_lazy(self):
+        code = 'import piano_fingering.fingering as f; print(len(f.COST_TABLES) + len(f.FINGER_OPTIONS))'
+        output = subprocess.check_output([sys.executable, '-c', code])
+        self.assertEqual(b'0', output.strip())
+
+    def test_package_import_is_lazy(self):
+        code = 'import sys, piano_fingering; print(sorted(set(["concurrent.futures", "shelve", "tempfile", ' \
+               '"piano_fingering.parallel"]) & set(sys.modules)))'
+        output = subprocess.check_output([sys.executable, '-c', code])
+        self.assertEqual(b'[]', output.strip())
+
+        code = 'from piano_fingering import computeFingeringBatch, FingeringSession; print(FingeringSession.__name__)'
+        output = subprocess.check_output([sys.executable, '-c', code])
+        self.assertEqual(b'FingeringSession', output.strip())
+
+    def test_warmup(self):
+        warmup()
+        self.assertEqual(set(['left', 'right']), set(fingering.COST_TABLES.keys()))
+        self.assertEqual(set(['left', 'right']), set(fingering.FINGER_OPTIONS.keys()))
+
+    def test_compatibility_attributes(self):
+        self.assertEqual(10, len(fingering.ALL_FINGER_OPTIONS_RIGHT[2]))
+        self.assertEqual(fingering.RIGHT_HAND_COST_TABLE.cost(48, 50, 1, 2),
+                         fingering.RIGHT_HAND_COST_DATABASE['48,50,1,2'])
+
+
+#----------------------------------------------------------
+
+
+class TestCosts(TestCase):
+
+    def test_state_cost_is_cached_on_nodes(self):
+        layer = makeLayer([60, 64, 67], 'right')
+        for node in layer:
+            self.assertEqual(calcStateCost([60, 64, 67], node.fingers, 'right'), node.state_cost)
+
+    def test_cost_is_transition_plus_state(self):
+        previous_node = Node([55, 59], [1, 3])
+        current_node = Node([60, 64, 67], [1, 3, 5])
+
+        self.assertEqual(calcTransitionCost(current_node, previous_node, 'left') +
+                         calcStateCost([60, 64, 67], [1, 3, 5], 'left'),
+                         calcCost(current_node, previous_node, 'left'))
+
+    def test_scores_are_total_costs(self):
+        notes = [ 60, [64, 67], 62, dict(notes=[60], fingers=[1]), [55, 59, 62], 72 ]
+        infos, rests = fingering.preprocessNotes(notes)
+
+        scores = fingering.relaxLayers(infos, 'right', [ 0 ], fingering.NotesInfo(notes=[], fingers=None))
+        self.assertEqual(min(scores), pathCost(computeFingering(notes, 'right'), 'right'))
+
+    def test_state_cost_of_single_note(self):
+        self.assertEqual(0, calcStateCost([60], [1], 'right'))
+
+    def test_transposed_chords_share_state_costs(self):
+        fingering.CHORD_STATE_COSTS.clear()
+
+        cost = calcStateCost([60, 64, 67], [1, 3, 5], 'right')
+        self.assertEqual(1, len(fingering.CHORD_STATE_COSTS))
+
+        # F major has the same colors and intervals than C major
+        self.assertEqual(cost, calcStateCost([65, 69, 72], [1, 3, 5], 'right'))
+        self.assertEqual(cost, calcStateCost([48, 52, 55], [1, 3, 5], 'right'))
+        self.assertEqual(1, len(fingering.CHORD_STATE_COSTS))
+
+        calcStateCost([62, 66, 69], [1, 3, 5], 'right')
+        self.assertEqual(2, len(fingering.CHORD_STATE_COSTS))
+
+
+#----------------------------------------------------------
+
+
+class TestMemoryModes(TestCase):
+
+    def test_same_results(self):
+        for nb_entries in (0, 1, 2, 3, 17, 100, 1000):
+            notes = randomNotes(nb_entries, nb_entries)
+
+            for left_or_right in ('right', 'left'):
+                expected = computeFingering(notes, left_or_right)
+                self.assertEqual(expected, computeFingering(notes, left_or_right, memory='compact'))
+                self.assertEqual(expected, computeFingering(notes, left_or_right, memory='checkpoints'))
+
+    def test_invalid_memory_mode(self):
+        self.assertRaises(ValueError, computeFingering, [60], 'right', memory='invalid')
+
+
+#----------------------------------------------------------
+
+
+class TestBeam(TestCase):
+
+    def test_prune_scores(self):
+        inf = float('inf')
+        self.assertEqual([ 0.0, inf, 1.0, inf ], pruneScores([ 0.0, 3.0, 1.0, 2.0 ], 2, None))
+        self.assertEqual([ 0.0, inf, 1.0, 2.0 ], pruneScores([ 0.0, 3.0, 1.0, 2.0 ], None, 2.5))
+        self.assertEqual([ 0.0, 1.0, inf ], pruneScores([ 0.0, 1.0, 1.0 ], 2, None))
+
+    def test_wide_beam_is_exact(self):
+        for seed in range(5):
+            notes = randomNotes(300, seed)
+            self.assertEqual(computeFingering(notes, 'right'), computeFingering(notes, 'right', beam=31))
+            self.assertEqual(computeFingering(notes, 'left'),
+                             computeFingering(notes, 'left', margin=float('inf')))
+
+    def test_narrow_beam(self):
+        notes = randomNotes(500, 0)
+
+        expected = computeFingering(notes, 'right')
+        result = computeFingering(notes, 'right', beam=1, margin=5.0)
+
+        self.assertEqual([ entry['notes'] for entry in expected ], [ entry['notes'] for entry in result ])
+        self.assertTrue(pathCost(expected, 'right') <= pathCost(result, 'right'))
+
+    def test_divergence(self):
+        corpus = [ randomNotes(100, seed) for seed in range(5) ]
+
+        report = beamDivergence(corpus, 'right', beam=31)
+        self.assertEqual(5, report['pieces'])
+        self.assertEqual(0, report['diverged_pieces'])
+        self.assertEqual(0, report['diverged_notes'])
+        self.assertEqual(0.0, report['cost_increase'])
+
+        report = beamDivergence(corpus, 'right', beam=1)
+        self.assertTrue(report['diverged_notes'] > 0)
+        self.assertTrue(report['cost_increase'] > 0.0)
+
+    def test_path_cost(self):
+        fingered_notes = [ dict(notes=[60], fingers=[1]), dict(notes=[], fingers=[]),
+                           dict(notes=[64, 67], fingers=[3, 5]) ]
+
+        self.assertEqual(calcCost(Node([64, 67], [3, 5]), Node([60], [1]), 'right'),
+                         pathCost(fingered_notes, 'right'))
+
+    def test_invalid_parameters(self):
+        self.assertRaises(ValueError, computeFingering, [60], 'right', beam=0)
+        self.assertRaises(ValueError, computeFingering, [60], 'right', margin=-1.0)
@@ -0,0 +1,63 @@
+import itertools
+from unittest import TestCase
+from ..fingering import computeFingering
+from ..fingering import layerOptions
+from ..fingering import pathCost
+from ..fingering import preprocessNotes
+from ..kbest import computeFingeringKBest
+from .test_vectorized import randomNotes
+
+
+class TestKBest(TestCase):
+
+    def test_same_results_than_exhaustive_enumeration(self):
+        for seed in range(20):
+            notes = randomNotes(5, seed)
+
+            for left_or_right in ('right', 'left'):
+                infos, rests = preprocessNotes(notes)
+                options = [ layerOptions(entry.notes, entry.fingers, left_or_right) for entry in infos ]
+
+                expected = sorted([ pathCost([ dict(notes=entry.notes, fingers=fingers)
+                                               for entry, fingers in zip(infos, path) ], left_or_right)
+                                    for path in itertools.product(*options) ])
+
+                results = computeFingeringKBest(notes, left_or_right, 50)
+                self.assertEqual(min(50, len(expected)), len(results))
+
+                for (fingered_notes, cost), expected_cost in zip(results, expected):
+                    self.assertAlmostEqual(expected_cost, cost)
+                    self.assertEqual(pathCost(fingered_notes, left_or_right), cost)
+
+    def test_best_fingering(self):
+        for seed in range(5):
+            notes = randomNotes(300, seed)
+
+            for left_or_right in ('right', 'left'):
+                results = computeFingeringKBest(notes, left_or_right, 20)
+                self.assertEqual(computeFingering(notes, left_or_right), results[0][0])
+
+                # Distinct fingerings, sorted by cost
+                fingerings = set([ repr(fingered_notes) for fingered_notes, cost in results ])
+                self.assertEqual(20, len(fingerings))
+
+                costs = [ cost for fingered_notes, cost in results ]
+                self.assertEqual(sorted(costs), costs)
+
+    def test_fewer_fingerings_than_k(self):
+        notes = [ 60, [], dict(notes=[62], fingers=[2]) ]
+        results = computeFingeringKBest(notes, 'right', 10)
+
+        self.assertEqual(5, len(results))
+        self.assertEqual(computeFingering(notes, 'right'), results[0][0])
+
+        for fingered_notes, cost in results:
+            self.assertEqual(dict(notes=[], fingers=[]), fingered_notes[1])
+            self.assertEqual([2], fingered_notes[2]['fingers'])
+
+    def test_empty(self):
+        self.assertEqual([ ([], 0) ], computeFingeringKBest([], 'right', 3))
+
+    def test_invalid_k(self):
+        with self.assertRaises(ValueError):
+            computeFingeringKBest([ 60 ], 'right', 0)
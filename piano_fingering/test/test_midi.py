@@ -1,6 +1,8 @@
 from unittest import TestCase
 from ..midi import nameToMidi
 from ..midi import listToMidi
+from ..midi import parseName
+from ..midi import stringToMidi
 
 
 class TestNameToMidi(TestCase):
@@ -19,6 +21,37 @@ class TestNameToMidi(TestCase):
     def test_natural_and_flat_notes(self):
         self.process(['C', 'Db', 'D', 'Eb', 'E', 'F', 'Gb', 'G', 'Ab', 'A', 'Bb', 'B'])
 
+    def test_double_accidentals(self):
+        self.process(['Dbb', 'C#', 'Cx', 'Fbb', 'Fb', 'E#', 'Ex', 'Abb', 'Ab', 'Bbb', 'A#', 'Ax'])
+
+        self.assertEqual(61, nameToMidi('B##4'))
+        self.assertEqual(58, nameToMidi('Cbb'))
+
+    def test_default_octave(self):
+        self.assertEqual(60, nameToMidi('C'))
+        self.assertEqual(70, nameToMidi('Bb'))
+        self.assertEqual(59, nameToMidi('Cb'))
+
+    def test_negative_octaves(self):
+        self.assertEqual(-12, nameToMidi('C-1'))
+        self.assertEqual(-1, nameToMidi('Cb0'))
+        self.assertEqual(-24, nameToMidi('Dbb-2'))
+
+    def test_names_outside_of_the_table(self):
+        for name in [ 'C11', 'G#42', 'Ab-5', 'C05', 'C+4', 'C5foo' ]:
+            self.assertEqual(parseName(name), nameToMidi(name))
+
+        self.assertEqual(132, nameToMidi('C11'))
+        self.assertEqual(48, nameToMidi('C+4'))
+        self.assertEqual(60, nameToMidi('C3foo'))
+
+    def test_invalid_names(self):
+        with self.assertRaises(KeyError):
+            nameToMidi('H5')
+
+        with self.assertRaises(KeyError):
+            nameToMidi('c5')
+
 
 #----------------------------------------------------------
 
@@ -99,3 +132,25 @@ class TestListToMidi(TestCase):
         ]
 
         self.process(notes, expected)
+
+
+#----------------------------------------------------------
+
+
+class TestStringToMidi(TestCase):
+
+    def test_separators(self):
+        self.assertEqual([60, 64, 67, 72, 46], stringToMidi(' C5 E5,G5 ,\tC6\nBb3 '))
+        self.assertEqual([60, 62], stringToMidi('C,,D'))
+
+    def test_same_than_names(self):
+        names = [ 'C', 'F#2', 'Ebb-1', 'Bx10', 'G12' ]
+        self.assertEqual([ nameToMidi(name) for name in names ], stringToMidi(' '.join(names)))
+
+    def test_empty(self):
+        self.assertEqual([], stringToMidi(''))
+        self.assertEqual([], stringToMidi(' , '))
+
+    def test_invalid_names(self):
+        with self.assertRaises(KeyError):
+            stringToMidi('C5 H5')
@@ -0,0 +1,194 @@
+import io
+from unittest import TestCase
+from xml.etree import ElementTree
+from ..fingering import computeFingering
+from ..musicxml import annotateMusicXml
+from ..musicxml import iterMusicXmlNotes
+from ..musicxml import writeMusicXmlFingering
+
+
+SAMPLE = b'''<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<!DOCTYPE score-partwise PUBLIC "-//Recordare//DTD MusicXML 4.0 Partwise//EN" "http://www.musicxml.org/dtds/partwise.dtd">
+<score-partwise version="4.0">
+  <!-- Comment -->
+  <part-list>
+    <score-part id="P1"><part-name>Piano</part-name></score-part>
+    <score-part id="P2"><part-name>Flute</part-name></score-part>
+  </part-list>
+  <part id="P1">
+    <measure number="1">
+      <attributes><divisions>1</divisions><staves>2</staves></attributes>
+      <note><pitch><step>C</step><octave>4</octave></pitch><duration>1</duration><voice>1</voice><staff>1</staff></note>
+      <note><chord/><pitch><step>G</step><octave>4</octave></pitch><duration>1</duration><voice>1</voice><staff>1</staff></note>
+      <note><chord/><pitch><step>E</step><octave>4</octave></pitch><duration>1</duration><voice>1</voice><staff>1</staff><notations><slur type="start"/></notations></note>
+      <note><rest/><duration>1</duration><voice>1</voice><staff>1</staff></note>
+      <note><pitch><step>F</step><alter>1</alter><octave>4</octave></pitch><duration>1</duration><voice>1</voice><staff>1</staff><lyric><text>a &amp; b</text></lyric></note>
+      <backup><duration>3</duration></backup>
+      <note><pitch><step>C</step><octave>3</octave></pitch><duration>3</duration><voice>5</voice><staff>2</staff></note>
+    </measure>
+    <measure number="2">
+      <note><grace/><pitch><step>A</step><octave>4</octave></pitch><voice>1</voice><staff>1</staff></note>
+      <note><pitch><step>B</step><alter>-1</alter><octave>4</octave></pitch><duration>1</duration><voice>1</voice><staff>1</staff></note>
+    </measure>
+  </part>
+  <part id="P2">
+    <measure number="1">
+      <note><pitch><step>D</step><octave>5</octave></pitch><duration>4</duration></note>
+    </measure>
+  </part>
+</score-partwise>
+'''
+
+TIES = b'''<?xml version="1.0" encoding="UTF-8"?>
+<score-partwise version="4.0">
+  <part id="P1">
+    <measure number="1">
+      <note><pitch><step>C</step><octave>4</octave></pitch><duration>4</duration><tie type="start"/></note>
+    </measure>
+    <measure number="2">
+      <note><pitch><step>C</step><octave>4</octave></pitch><duration>2</duration><tie type="stop"/><!-- Held --></note>
+      <note><chord/><pitch><step>E</step><octave>4</octave></pitch><duration>2</duration></note>
+      <note><pitch><step>D</step><octave>4</octave></pitch><duration>2</duration></note>
+    </measure>
+  </part>
+</score-partwise>
+'''
+
+VOICES = b'''<?xml version="1.0" encoding="UTF-8"?>
+<score-partwise version="4.0">
+  <part id="P1">
+    <measure number="1">
+      <attributes><divisions>2</divisions></attributes>
+      <note><pitch><step>E</step><octave>5</octave></pitch><duration>2</duration><voice>1</voice></note>
+      <note><pitch><step>F</step><octave>5</octave></pitch><duration>2</duration><voice>1</voice></note>
+      <backup><duration>4</duration></backup>
+      <note><pitch><step>C</step><octave>5</octave></pitch><duration>2</duration><voice>2</voice></note>
+      <note><rest/><duration>2</duration><voice>2</voice></note>
+    </measure>
+    <measure number="2">
+      <note><pitch><step>G</step><octave>5</octave></pitch><duration>8</duration><voice>1</voice></note>
+      <backup><duration>8</duration></backup>
+      <forward><duration>4</duration></forward>
+      <note><pitch><step>A</step><octave>4</octave></pitch><duration>4</duration><voice>2</voice></note>
+    </measure>
+    <measure number="3">
+      <attributes><divisions>1</divisions></attributes>
+      <note><pitch><step>C</step><octave>5</octave></pitch><duration>1</duration><voice>1</voice></note>
+      <backup><duration>1</duration></backup>
+      <note><pitch><step>C</step><octave>5</octave></pitch><duration>1</duration><voice>2</voice></note>
+    </measure>
+  </part>
+</score-partwise>
+'''
+
+TIMEWISE = b'''<?xml version="1.0" encoding="UTF-8"?>
+<score-timewise version="4.0">
+  <measure number="1">
+    <part id="P1">
+      <note><pitch><step>C</step><octave>4</octave></pitch><duration>4</duration></note>
+    </part>
+  </measure>
+</score-timewise>
+'''
+
+
+def fingeringElements(content):
+    root = ElementTree.fromstring(content)
+
+    return [ (part.get('id'), note.findtext('pitch/step'), note.findtext('notations/technical/fingering'))
+             for part in root.iter('part') for note in part.iter('note') ]
+
+
+class TestReader(TestCase):
+
+    def test_notes(self):
+        self.assertEqual([ [48, 60, 64, 67], [], 66, 70 ], list(iterMusicXmlNotes(SAMPLE)))
+        self.assertEqual([ [60, 64, 67], [], 66, 70 ], list(iterMusicXmlNotes(SAMPLE, staff=1)))
+        self.assertEqual([ 48 ], list(iterMusicXmlNotes(io.BytesIO(SAMPLE), staff=2)))
+        self.assertEqual([ 48 ], list(iterMusicXmlNotes(SAMPLE, voice=5)))
+        self.assertEqual([ 74 ], list(iterMusicXmlNotes(SAMPLE, part='P2')))
+        self.assertEqual([], list(iterMusicXmlNotes(SAMPLE, part='P3')))
+
+    def test_ties(self):
+        self.assertEqual([ 60, 64, 62 ], list(iterMusicXmlNotes(TIES)))
+
+    def test_voices(self):
+        # The notes of the voices are merged by onset
+        self.assertEqual([ [72, 76], 77, 79, 69, 72 ], list(iterMusicXmlNotes(VOICES)))
+        self.assertEqual([ 72, [], 69, 72 ], list(iterMusicXmlNotes(VOICES, voice=2)))
+
+    def test_timewise(self):
+        with self.assertRaises(ValueError):
+            list(iterMusicXmlNotes(TIMEWISE))
+
+
+#----------------------------------------------------------
+
+
+class TestWriter(TestCase):
+
+    def test_fingering(self):
+        output = io.BytesIO()
+        annotateMusicXml(SAMPLE, output, 'right', staff=1)
+        content = output.getvalue()
+
+        fingered_notes = computeFingering(list(iterMusicXmlNotes(SAMPLE, staff=1)), 'right')
+        chord = dict(zip(fingered_notes[0]['notes'], fingered_notes[0]['fingers']))
+
+        self.assertEqual([ ('P1', 'C', str(chord[60])), ('P1', 'G', str(chord[67])),
+                           ('P1', 'E', str(chord[64])), ('P1', None, None),
+                           ('P1', 'F', str(fingered_notes[2]['fingers'][0])), ('P1', 'C', None),
+                           ('P1', 'A', None), ('P1', 'B', str(fingered_notes[3]['fingers'][0])),
+                           ('P2', 'D', None) ],
+                         fingeringElements(content))
+
+        # Everything else is kept
+        self.assertEqual(list(iterMusicXmlNotes(SAMPLE)), list(iterMusicXmlNotes(content)))
+        self.assertTrue(content.startswith(b'<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE score-partwise PUBLIC'))
+        self.assertTrue(b'<!-- Comment -->' in content)
+        self.assertTrue(b'<chord/>' in content)
+        self.assertTrue(b'<slur type="start"/><technical><fingering>' in content)
+        self.assertTrue(b'</notations><lyric><text>a &amp; b</text></lyric>' in content)
+
+    def test_other_part(self):
+        output = io.BytesIO()
+        writeMusicXmlFingering(SAMPLE, output, [ dict(notes=[74], fingers=[3]) ], part='P2')
+        self.assertEqual(('P2', 'D', '3'), fingeringElements(output.getvalue())[-1])
+
+    def test_wrong_fingering(self):
+        self.assertRaises(ValueError, writeMusicXmlFingering, SAMPLE, io.BytesIO(),
+                          [ dict(notes=[72], fingers=[3]) ], part='P2')
+
+    def test_short_fingering(self):
+        self.assertRaises(ValueError, writeMusicXmlFingering, SAMPLE, io.BytesIO(),
+                          [ dict(notes=[60, 64, 67], fingers=[1, 3, 5]) ], staff=1)
+
+    def test_ties(self):
+        output = io.BytesIO()
+        fingered_notes = [ dict(notes=[60], fingers=[1]), dict(notes=[64], fingers=[3]),
+                           dict(notes=[62], fingers=[2]) ]
+        writeMusicXmlFingering(TIES, output, fingered_notes)
+        content = output.getvalue()
+
+        # No fingering on the held note, whose comment is kept
+        self.assertEqual([ ('P1', 'C', '1'), ('P1', 'C', None), ('P1', 'E', '3'), ('P1', 'D', '2') ],
+                         fingeringElements(content))
+        self.assertTrue(b'<tie type="stop"/><!-- Held --></note>' in content)
+
+    def test_voices(self):
+        output = io.BytesIO()
+        fingered_notes = [ dict(notes=[72, 76], fingers=[1, 3]), dict(notes=[77], fingers=[4]),
+                           dict(notes=[79], fingers=[5]), dict(notes=[69], fingers=[1]),
+                           dict(notes=[72], fingers=[2]) ]
+        writeMusicXmlFingering(VOICES, output, fingered_notes)
+        content = output.getvalue()
+
+        self.assertEqual([ ('P1', 'E', '3'), ('P1', 'F', '4'), ('P1', 'C', '1'), ('P1', None, None),
+                           ('P1', 'G', '5'), ('P1', 'A', '1'), ('P1', 'C', '2'), ('P1', 'C', '2') ],
+                         fingeringElements(content))
+        self.assertEqual(list(iterMusicXmlNotes(VOICES)), list(iterMusicXmlNotes(content)))
+        self.assertTrue(b'<backup><duration>4</duration></backup>' in content)
+
+    def test_timewise(self):
+        self.assertRaises(ValueError, writeMusicXmlFingering, TIMEWISE, io.BytesIO(),
+                          [ dict(notes=[60], fingers=[1]) ])
@@ -0,0 +1,150 @@
+from unittest import TestCase
+from ..fingering import NotesInfo
+from ..fingering import computeFingering
+from ..fingering import findBestPath
+from ..fingering import getCostTable
+from ..fingering import insertRests
+from ..fingering import pathCost
+from ..fingering import preprocessNotes
+from ..parallel import computeFingeringBatch
+from ..parallel import engineRelaxLayers
+from ..parallel import iterFingeringBatch
+from ..parallel import getPool
+from ..parallel import shutdownPool
+from ..parallel import splitRanges
+from .test_vectorized import randomNotes
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def relativeFingering(notes, left_or_right, engine='python', memory='full', beam=None):
+    """Sequential computation of the fingering, with the scores relative to the best
+    one of each layer (see 'fingering.relaxLayers()')
+    """
+    notes, rests = preprocessNotes(notes)
+    result = findBestPath(notes, left_or_right, engineRelaxLayers(engine), memory, beam=beam,
+                          relative=True)
+    return insertRests(result, rests)
+
+
+def workerCostTablesInfos():
+    from .. import storage
+    from ..fingering import getCostTable
+    return len(storage.ATTACHED_BLOCKS), getCostTable('right').cost(48, 50, 1, 2)
+
+
+class TestParallel(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutdownPool()
+
+    def test_split_ranges(self):
+        free = NotesInfo(notes=[60], fingers=None)
+        fixed = NotesInfo(notes=[60], fingers=[1])
+        chord = NotesInfo(notes=[60, 62, 64, 65, 67], fingers=None)
+
+        # Ranges started after the anchors when possible
+        self.assertEqual([ (0, 11), (11, 20) ], splitRanges([ free ] * 10 + [ fixed ] + [ free ] * 9, 2))
+        self.assertEqual([ (0, 10), (10, 20) ], splitRanges([ free ] * 9 + [ chord ] + [ free ] * 10, 2))
+
+        self.assertEqual([ (0, 12), (12, 24), (24, 36), (36, 40) ], splitRanges([ free ] * 40, 4))
+        self.assertEqual([ (0, 40) ], splitRanges([ free ] * 40, 1))
+
+    def test_same_results_than_sequential(self):
+        for seed in range(3):
+            notes = randomNotes(2000, seed)
+
+            for left_or_right in ('right', 'left'):
+                result = computeFingering(notes, left_or_right, workers=2)
+                self.assertEqual(relativeFingering(notes, left_or_right), result)
+
+                # Only the rounding of the scores differs from the default computation
+                self.assertAlmostEqual(pathCost(computeFingering(notes, left_or_right), left_or_right),
+                                       pathCost(result, left_or_right), places=6)
+
+    def test_same_costs_than_sequential(self):
+        # The fingering can differ from the sequential one, but only between
+        # fingerings whose costs are equal up to the rounding
+        for seed in range(10, 30):
+            notes = randomNotes(600, seed)
+
+            for left_or_right in ('right', 'left'):
+                expected = pathCost(computeFingering(notes, left_or_right), left_or_right)
+                cost = pathCost(computeFingering(notes, left_or_right, workers=2), left_or_right)
+                self.assertAlmostEqual(expected, cost, delta=expected * 1e-12)
+
+    def test_without_anchors(self):
+        notes = [ entry if isinstance(entry, (int, list)) else entry['notes'] for entry in randomNotes(3000, 3) ]
+
+        for engine in ('python', 'numpy'):
+            if (engine == 'numpy') and (numpy is None):
+                continue
+
+            for left_or_right in ('right', 'left'):
+                self.assertEqual(relativeFingering(notes, left_or_right, engine=engine),
+                                 computeFingering(notes, left_or_right, engine=engine, workers=3))
+
+    def test_memory_modes(self):
+        notes = randomNotes(1000, 4)
+        expected = relativeFingering(notes, 'right')
+
+        self.assertEqual(expected, computeFingering(notes, 'right', memory='compact', workers=2))
+
+        # The checkpoints can't be used when the notes are split
+        with self.assertWarns(RuntimeWarning):
+            result = computeFingering(notes, 'right', memory='checkpoints', workers=2)
+
+        self.assertEqual(expected, result)
+
+    def test_beam(self):
+        notes = randomNotes(2000, 5)
+        self.assertEqual(relativeFingering(notes, 'right', beam=2),
+                         computeFingering(notes, 'right', beam=2, workers=2))
+
+    def test_cost_tables_are_shared(self):
+        nb_attached_blocks, cost = getPool(2).submit(workerCostTablesInfos).result()
+        self.assertEqual(1, nb_attached_blocks)
+        self.assertEqual(getCostTable('right').cost(48, 50, 1, 2), cost)
+
+    def test_small_lists(self):
+        notes = [ 60, dict(notes=[62], fingers=[2]), [], 64 ]
+        self.assertEqual(computeFingering(notes, 'right'), computeFingering(notes, 'right', workers=2))
+
+
+#----------------------------------------------------------
+
+
+class TestBatch(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        shutdownPool()
+
+    def test_same_results_than_computeFingering(self):
+        notes_lists = [ randomNotes(100, seed) for seed in range(40) ]
+        hands = [ 'right', 'left' ] * 20
+
+        expected = [ computeFingering(notes, left_or_right)
+                     for notes, left_or_right in zip(notes_lists, hands) ]
+
+        self.assertEqual(expected, computeFingeringBatch(notes_lists, hands, workers=2, chunksize=3))
+        self.assertEqual(expected, computeFingeringBatch(notes_lists, hands, workers=1))
+
+    def test_streaming(self):
+        notes_lists = [ randomNotes(100, seed) for seed in range(40) ]
+
+        results = dict(iterFingeringBatch(notes_lists, 'right', workers=2))
+
+        self.assertEqual(list(range(40)), sorted(results.keys()))
+        self.assertEqual(computeFingering(notes_lists[7], 'right'), results[7])
+
+    def test_small_batches(self):
+        self.assertEqual([], computeFingeringBatch([], 'right'))
+        self.assertEqual([ computeFingering([60, 62], 'left') ], computeFingeringBatch([ [60, 62] ], 'left'))
+
+    def test_invalid_hands(self):
+        self.assertRaises(ValueError, computeFingeringBatch, [ [60], [62] ], [ 'right' ])
@@ -0,0 +1,52 @@
+from unittest import TestCase
+from ..cost import NB_FINGERS
+from ..fingering import computeFingering
+from ..fingering import getCostTable
+from ..search import getLowerBoundTable
+from ..search import searchFingering
+from .test_vectorized import randomNotes
+
+
+class TestSearch(TestCase):
+
+    def test_lower_bounds(self):
+        for left_or_right in ('right', 'left'):
+            cost_table = getCostTable(left_or_right)
+            lower_bounds = getLowerBoundTable(left_or_right)
+
+            for n1 in range(55, 67):
+                for n2 in range(n1 - 40, n1 + 41):
+                    for f2 in range(1, NB_FINGERS + 1):
+                        bound = lower_bounds.bound(n1, n2, f2)
+                        costs = [ cost_table.cost(n1, n2, f1, f2) for f1 in range(1, NB_FINGERS + 1) ]
+                        self.assertEqual(min(costs), bound)
+
+    def test_same_results_than_computeFingering(self):
+        for seed in range(10):
+            notes = randomNotes(300, seed)
+
+            for left_or_right in ('right', 'left'):
+                expected = computeFingering(notes, left_or_right)
+                self.assertEqual(expected, computeFingering(notes, left_or_right, engine='branch_and_bound'))
+
+                result, stats = searchFingering(notes, left_or_right)
+                self.assertEqual(expected, result)
+                self.assertLess(stats['edges_evaluated'], stats['edges_total'])
+
+    def test_memory_modes(self):
+        notes = randomNotes(500, 0)
+        expected = computeFingering(notes, 'right')
+
+        for memory in ('compact', 'checkpoints'):
+            self.assertEqual(expected, computeFingering(notes, 'right', engine='branch_and_bound',
+                                                        memory=memory))
+
+    def test_beam(self):
+        notes = randomNotes(300, 1)
+        self.assertEqual(computeFingering(notes, 'right', beam=3),
+                         computeFingering(notes, 'right', engine='branch_and_bound', beam=3))
+
+    def test_fingered_notes(self):
+        notes = [ 60, dict(notes=[64], fingers=[3]), [], [60, 64, 67], 72 ]
+        self.assertEqual(computeFingering(notes, 'left'),
+                         computeFingering(notes, 'left', engine='branch_and_bound'))
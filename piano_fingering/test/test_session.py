@@ -0,0 +1,87 @@
+import random
+from unittest import TestCase
+from ..fingering import computeFingering
+from ..session import FingeringSession
+from .test_parallel import relativeFingering
+from .test_vectorized import randomNotes
+
+
+class TestSession(TestCase):
+
+    def test_same_results_than_from_scratch(self):
+        for left_or_right in ('right', 'left'):
+            notes = randomNotes(300, 0)
+            session = FingeringSession(notes, left_or_right)
+            self.assertEqual(relativeFingering(notes, left_or_right), session.fingering())
+
+    def test_edits(self):
+        generator = random.Random(0)
+        entries = randomNotes(1000, 1)
+
+        for left_or_right in ('right', 'left'):
+            notes = randomNotes(200, 2)
+            session = FingeringSession(notes, left_or_right)
+            fingering = session.fingering()
+
+            for i in range(100):
+                operation = generator.choice([ 'insert', 'delete', 'replace' ])
+                entry = generator.choice(entries)
+
+                if operation == 'insert':
+                    index = generator.randint(0, len(notes))
+                    notes.insert(index, entry)
+                    fingering.insert(index, None)
+                    changes = session.insert(index, entry)
+                elif operation == 'delete':
+                    index = generator.randrange(len(notes))
+                    del notes[index]
+                    del fingering[index]
+                    changes = session.delete(index)
+                else:
+                    index = generator.randrange(len(notes))
+                    notes[index] = entry
+                    changes = session.replace(index, entry)
+
+                # Applying the changes must give the same fingering than a
+                # computation from scratch
+                for index, fingered_notes in changes:
+                    fingering[index] = fingered_notes
+
+                expected = relativeFingering(notes, left_or_right)
+                self.assertEqual(expected, fingering)
+                self.assertEqual(expected, session.fingering())
+
+    def test_only_the_edited_window_is_relaxed(self):
+        notes = randomNotes(3000, 3)
+        session = FingeringSession(notes, 'right')
+        self.assertEqual(3000 - notes.count([]), session.relaxed_layers)
+
+        session.replace(1500, 62)
+        self.assertLess(session.relaxed_layers, 100)
+
+        session.insert(10, [60, 64])
+        self.assertLess(session.relaxed_layers, 100)
+
+        session.delete(2000)
+        self.assertLess(session.relaxed_layers, 100)
+
+    def test_empty(self):
+        session = FingeringSession([], 'right')
+        self.assertEqual([], session.fingering())
+
+        self.assertEqual([ (0, dict(notes=[], fingers=[])) ], session.insert(0, []))
+        self.assertEqual([ (1, dict(notes=[60], fingers=[1])) ], session.insert(1, 60))
+        self.assertEqual([], session.delete(1))
+        self.assertEqual([ dict(notes=[], fingers=[]) ], session.fingering())
+
+    def test_invalid_index(self):
+        session = FingeringSession([ 60, 62 ], 'right')
+
+        with self.assertRaises(IndexError):
+            session.delete(2)
+
+        with self.assertRaises(IndexError):
+            session.insert(4, 60)
+
+        session.replace(-1, 64)
+        self.assertEqual(computeFingering([ 60, 64 ], 'right'), session.fingering())
@@ -0,0 +1,146 @@
+import io
+import os
+import shutil
+import struct
+import tempfile
+from unittest import TestCase
+from ..fingering import computeFingering
+from ..smf import annotateMidi
+from ..smf import iterMidiChords
+from ..smf import iterMidiNotes
+from ..smf import iterTrackChunks
+from ..smf import iterTrackEvents
+from ..smf import readHeader
+from ..smf import writeMidiFingering
+from ..smf import writeVariableLength
+
+
+def trackChunk(events):
+    """Return a track chunk containing the provided (delta time, bytes) events"""
+    data = bytearray()
+    for delta, event in events + [ (0, b'\xff\x2f\x00') ]:
+        writeVariableLength(data, delta)
+        data.extend(event)
+
+    return b'MTrk' + struct.pack('>I', len(data)) + bytes(data)
+
+
+def midiFile(*tracks):
+    return b'MThd' + struct.pack('>IHHH', 6, 1, len(tracks), 480) + b''.join(tracks)
+
+
+def metaEvents(content, meta_type):
+    stream = io.BytesIO(content)
+    readHeader(stream)
+
+    texts = []
+    for data in iterTrackChunks(stream):
+        for tick, status, offset, start in iterTrackEvents(data):
+            if (status == 0xFF) and (data[offset] == meta_type):
+                texts.append((tick, data[offset + 2:offset + 2 + data[offset + 1]].decode('ascii')))
+
+    return texts
+
+
+# Tempo track, then: C-E-G chord, rest, D (running status), E on channel 1,
+# legato F with a long variable-length delta time
+TEMPO_TRACK = trackChunk([ (0, b'\xff\x51\x03\x07\xa1\x20') ])
+
+NOTES_TRACK = trackChunk([
+    (0, b'\x90\x3c\x40'), (0, b'\x90\x40\x40'), (0, b'\x90\x43\x40'),
+    (480, b'\x80\x3c\x00'), (0, b'\x80\x40\x00'), (0, b'\x80\x43\x00'),
+    (240, b'\x90\x3e\x40'), (240, b'\x3e\x00'),
+    (0, b'\x91\x40\x40'), (0, b'\xff\x01\x02hi'), (480, b'\x81\x40\x00'),
+    (0, b'\x90\x41\x40'), (20000, b'\x80\x41\x00'),
+])
+
+
+class TestReader(TestCase):
+
+    def test_notes(self):
+        content = midiFile(TEMPO_TRACK, NOTES_TRACK)
+        self.assertEqual([ [60, 64, 67], [], 62, 64, 65 ], list(iterMidiNotes(content)))
+        self.assertEqual([ (0, [60, 64, 67]), (480, []), (720, [62]), (960, [64]), (1440, [65]) ],
+                         list(iterMidiChords(content)))
+
+    def test_track_and_channels(self):
+        content = midiFile(TEMPO_TRACK, NOTES_TRACK)
+        self.assertEqual([], list(iterMidiNotes(content, track=0)))
+        self.assertEqual([ [60, 64, 67], [], 62, [], 65 ], list(iterMidiNotes(content, channels=[0])))
+        self.assertEqual([ 64 ], list(iterMidiNotes(content, track=1, channels=[1])))
+
+    def test_sources(self):
+        content = midiFile(TEMPO_TRACK, NOTES_TRACK)
+        expected = list(iterMidiNotes(content))
+
+        self.assertEqual(expected, list(iterMidiNotes(io.BytesIO(content))))
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        filename = os.path.join(directory, 'notes.mid')
+        with open(filename, 'wb') as f:
+            f.write(content)
+
+        self.assertEqual(expected, list(iterMidiNotes(filename)))
+
+    def test_invalid_files(self):
+        self.assertRaises(ValueError, list, iterMidiNotes(b'MThd'))
+        self.assertRaises(ValueError, list, iterMidiNotes(b'RIFF' + bytes(10)))
+        self.assertRaises(ValueError, list, iterMidiNotes(midiFile(NOTES_TRACK)[:-10]))
+
+    def test_truncated_events(self):
+        # Chunks cut off in the delta time, the status, the data of a note, and
+        # the size and data of a meta event
+        for data in (b'\x81', b'\x00', b'\x00\x90\x3c', b'\x00\xff', b'\x00\xff\x01\x81',
+                     b'\x00\xff\x01\x05hi'):
+            content = midiFile(b'MTrk' + struct.pack('>I', len(data)) + data)
+            self.assertRaises(ValueError, list, iterMidiNotes(content))
+
+
+#----------------------------------------------------------
+
+
+class TestWriter(TestCase):
+
+    def test_fingering(self):
+        content = midiFile(TEMPO_TRACK, NOTES_TRACK)
+
+        output = io.BytesIO()
+        annotateMidi(content, output, 'right')
+        annotated = output.getvalue()
+
+        notes = list(iterMidiNotes(content))
+        expected = [ (tick, '-'.join([ str(finger) for finger in entry['fingers'] ]))
+                     for (tick, chord), entry in zip(iterMidiChords(content),
+                                                     computeFingering(notes, 'right'))
+                     if len(chord) > 0 ]
+
+        self.assertEqual(expected, metaEvents(annotated, 0x05))
+
+        # The other events are unchanged
+        self.assertEqual(list(iterMidiChords(content)), list(iterMidiChords(annotated)))
+        self.assertEqual([ (960, 'hi') ], metaEvents(annotated, 0x01))
+
+    def test_text_events_and_channels(self):
+        content = midiFile(TEMPO_TRACK, NOTES_TRACK)
+        fingered_notes = [ dict(notes=[64], fingers=[3]) ]
+
+        output = io.BytesIO()
+        writeMidiFingering(content, output, fingered_notes, channels=[1], meta='text')
+
+        self.assertEqual([ (960, '3'), (960, 'hi') ], metaEvents(output.getvalue(), 0x01))
+
+    def test_short_fingering(self):
+        content = midiFile(TEMPO_TRACK, NOTES_TRACK)
+        fingered_notes = [ dict(notes=[64], fingers=[3]) ]
+
+        with self.assertRaises(ValueError):
+            writeMidiFingering(content, io.BytesIO(), fingered_notes)
+
+    def test_variable_length(self):
+        for value, expected in ((0, b'\x00'), (0x7F, b'\x7f'), (0x80, b'\x81\x00'),
+                                (0x0FFFFFFF, b'\xff\xff\xff\x7f')):
+            data = bytearray()
+            writeVariableLength(data, value)
+            self.assertEqual(expected, bytes(data))
@@ -0,0 +1,127 @@
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+from .. import cost
+from ..cost import createCostTables
+from ..storage import ATTACHED_BLOCKS
+from ..storage import attachCostTables
+from ..storage import cacheFilename
+from ..storage import deserializeCostTables
+from ..storage import detachCostTables
+from ..storage import loadCostTables
+from ..storage import loadOrCreateCostTables
+from ..storage import publishCostTables
+from ..storage import saveCostTables
+from ..storage import serializeCostTables
+from ..storage import unpublishCostTables
+
+
+class TestStorage(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check(self, expected_tables, tables):
+        for expected, table in zip(expected_tables, tables):
+            self.assertEqual(expected.max_interval, table.max_interval)
+
+        self.assertEqual(list(expected_tables[0].values), list(tables[0].values))
+        self.assertEqual(list(expected_tables[0].tail_offsets), list(tables[0].tail_offsets))
+        self.assertEqual(list(expected_tables[1].unisons), list(tables[1].unisons))
+        self.assertIs(tables[0], tables[1].table)
+
+    def test_serialization(self):
+        tables = createCostTables()
+        self.check(tables, deserializeCostTables(serializeCostTables(*tables)))
+
+    def test_save_and_load(self):
+        tables = createCostTables()
+        filename = os.path.join(self.directory, 'tables.bin')
+        saveCostTables(filename, *tables)
+
+        loaded_tables = loadCostTables(filename)
+        self.check(tables, loaded_tables)
+        self.assertEqual(tables[0].cost(48, 90, 1, 2), loaded_tables[0].cost(48, 90, 1, 2))
+
+    def test_invalid_file(self):
+        filename = os.path.join(self.directory, 'tables.bin')
+        with open(filename, 'wb') as f:
+            f.write(b'invalid')
+
+        self.assertRaises(ValueError, loadCostTables, filename)
+
+    def test_cache(self):
+        tables = loadOrCreateCostTables(self.directory)
+        self.assertTrue(os.path.exists(cacheFilename(self.directory)))
+        self.check(createCostTables(), tables)
+        self.check(tables, loadOrCreateCostTables(self.directory))
+
+    def test_outdated_versions_are_removed(self):
+        for version in (0, 1):
+            with open(cacheFilename(self.directory, version), 'wb') as f:
+                f.write(b'outdated')
+
+        other_filename = os.path.join(self.directory, 'cost_tables-vX.bin')
+        with open(other_filename, 'wb') as f:
+            f.write(b'other')
+
+        loadOrCreateCostTables(self.directory)
+
+        self.assertEqual(sorted([ os.path.basename(cacheFilename(self.directory)), 'cost_tables-vX.bin' ]),
+                         sorted(os.listdir(self.directory)))
+
+    def test_stale_cache(self):
+        loadOrCreateCostTables(self.directory)
+
+        previous_cutoff = cost.MOVE_CUTOFF
+        cost.MOVE_CUTOFF = 6.5
+        try:
+            self.assertRaises(ValueError, loadCostTables, cacheFilename(self.directory))
+
+            tables = loadOrCreateCostTables(self.directory)
+            self.check(createCostTables(), tables)
+            self.check(tables, loadCostTables(cacheFilename(self.directory)))
+        finally:
+            cost.MOVE_CUTOFF = previous_cutoff
+
+
+#----------------------------------------------------------
+
+
+class TestSharedMemory(TestCase):
+
+    def test_publish_and_attach(self):
+        tables = createCostTables()
+        block = publishCostTables(*tables)
+
+        try:
+            attached_tables = attachCostTables(block.name)
+            self.assertTrue(block.name in ATTACHED_BLOCKS)
+
+            self.assertEqual(list(tables[0].values), list(attached_tables[0].values))
+            self.assertEqual(list(tables[1].unisons), list(attached_tables[1].unisons))
+            self.assertTrue(attached_tables[0].values.readonly)
+            self.assertTrue(attached_tables[1].unisons.readonly)
+
+            self.assertEqual(tables[1].cost(48, 90, 1, 2), attached_tables[1].cost(48, 90, 1, 2))
+
+            del attached_tables
+            detachCostTables(block.name)
+            self.assertFalse(block.name in ATTACHED_BLOCKS)
+        finally:
+            unpublishCostTables(block)
+
+    def test_invalid_block(self):
+        from multiprocessing import shared_memory
+
+        block = shared_memory.SharedMemory(create=True, size=100)
+        try:
+            self.assertRaises(ValueError, attachCostTables, block.name)
+            self.assertFalse(block.name in ATTACHED_BLOCKS)
+        finally:
+            block.close()
+            block.unlink()
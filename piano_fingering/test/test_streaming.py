@@ -0,0 +1,51 @@
+from unittest import TestCase
+from ..fingering import computeFingering
+from ..streaming import FingeringDecoder
+from ..streaming import iterFingering
+from .test_vectorized import randomNotes
+
+
+class TestStreaming(TestCase):
+
+    def test_same_results_than_computeFingering(self):
+        for seed in range(10):
+            notes = randomNotes(300, seed)
+
+            for left_or_right in ('right', 'left'):
+                expected = computeFingering(notes, left_or_right)
+                self.assertEqual(expected, list(iterFingering(iter(notes), left_or_right, lag=None)))
+                self.assertEqual(expected, list(iterFingering(iter(notes), left_or_right)))
+
+    def test_rests(self):
+        notes = [ [], 60, [], [], 64, [] ]
+        self.assertEqual(computeFingering(notes, 'right'), list(iterFingering(notes, 'right')))
+
+    def test_fingered_notes_are_emitted_immediately(self):
+        decoder = FingeringDecoder('right')
+        self.assertEqual([], decoder.push(60))
+
+        # Only one possible fingering: the previous notes are known
+        self.assertEqual([ dict(notes=[60], fingers=[1]), dict(notes=[64], fingers=[3]) ],
+                         decoder.push(dict(notes=[64], fingers=[3])))
+        self.assertEqual([ dict(notes=[], fingers=[]) ], decoder.push([]))
+        self.assertEqual([], decoder.flush())
+
+    def test_lag(self):
+        notes = randomNotes(1000, 0)
+
+        for lag in (0, 1, 4):
+            decoder = FingeringDecoder('right', lag=lag)
+            result = []
+
+            for entry in notes:
+                result.extend(decoder.push(entry))
+                self.assertTrue(len(decoder.layers) <= lag)
+
+            result.extend(decoder.flush())
+
+            self.assertEqual(len(notes), len(result))
+            self.assertEqual([ entry['notes'] for entry in computeFingering(notes, 'right') ],
+                             [ entry['notes'] for entry in result ])
+
+    def test_invalid_lag(self):
+        self.assertRaises(ValueError, FingeringDecoder, 'right', lag=-1)
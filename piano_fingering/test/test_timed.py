@@ -0,0 +1,66 @@
+from unittest import TestCase
+from ..fingering import computeFingering
+from ..streaming import iterFingering
+from ..timed import iterTimedChords
+from ..timed import iterTimedNotes
+
+
+# C-E-G chord (slightly spread), rest, D, E overlapping F, arpeggio
+EVENTS = [
+    (0.0, 0.5, 60), (0.01, 0.5, 64), (0.02, 0.49, 67),
+    (0.75, 0.25, 62),
+    (1.0, 0.5, 64), (1.45, 0.6, 65),
+    (2.0, 1.0, 60), (2.05, 1.0, 64), (2.1, 1.0, 67),
+]
+
+
+class TestTimedNotes(TestCase):
+
+    def test_chords(self):
+        self.assertEqual([ (0.0, [60, 64, 67]), (0.51, []), (0.75, [62]), (1.0, [64]),
+                           (1.45, [65]), (2.0, [60]), (2.05, [64]), (2.1, [67]) ],
+                         list(iterTimedChords(EVENTS, tolerance=0.03)))
+
+    def test_tolerance(self):
+        self.assertEqual([ 60, 64, 67, [], 62, 64, 65, 60, 64, 67 ], list(iterTimedNotes(EVENTS)))
+        self.assertEqual([ [60, 64, 67], [], 62, 64, 65, [60, 64], 67 ],
+                         list(iterTimedNotes(EVENTS, tolerance=0.05)))
+
+        # The tolerance is relative to the first note of the chord
+        self.assertEqual([ [60, 64, 67], [], 62, 64, 65, [60, 64, 67] ],
+                         list(iterTimedNotes(EVENTS, tolerance=0.1)))
+
+    def test_rests(self):
+        self.assertEqual([ [60, 64, 67], 62, 64, 65, [60, 64, 67] ],
+                         list(iterTimedNotes(EVENTS, tolerance=0.1, min_rest=0.25)))
+
+        # A long note hides the gaps between the following ones
+        self.assertEqual([ 48, 60, 62 ],
+                         list(iterTimedNotes([ (0, 4, 48), (1, 1, 60), (3, 1, 62) ])))
+        self.assertEqual([ 60, [], 62 ], list(iterTimedNotes([ (1, 1, 60), (3, 1, 62) ])))
+
+    def test_unsorted(self):
+        events = list(reversed(EVENTS))
+        self.assertEqual(list(iterTimedNotes(EVENTS, tolerance=0.03)),
+                         list(iterTimedNotes(events, tolerance=0.03)))
+
+        with self.assertRaises(ValueError):
+            list(iterTimedNotes(iter(events), presorted=True))
+
+    def test_repeated_notes(self):
+        self.assertEqual([ 60, [60, 64] ],
+                         list(iterTimedNotes([ (0, 1, 60), (1, 1, 60), (1.01, 1, 64), (1, 1, 60) ],
+                                             tolerance=0.02)))
+
+    def test_empty(self):
+        self.assertEqual([], list(iterTimedNotes([])))
+
+        with self.assertRaises(ValueError):
+            list(iterTimedNotes(EVENTS, tolerance=-1))
+
+    def test_fingering(self):
+        notes = list(iterTimedNotes(EVENTS, tolerance=0.03))
+        self.assertEqual(computeFingering(notes, 'right'),
+                         list(iterFingering(iterTimedNotes(iter(EVENTS), tolerance=0.03,
+                                                           presorted=True),
+                                            'right', lag=None)))
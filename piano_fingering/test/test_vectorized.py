@@ -0,0 +1,86 @@
+from unittest import TestCase
+from unittest import skipIf
+import random
+from ..fingering import computeFingering
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def randomNotes(nb_entries, seed):
+    generator = random.Random(seed)
+    notes = []
+    current = 60
+
+    for i in range(nb_entries):
+        current = max(21, min(108, current + generator.randint(-7, 7)))
+        if generator.random() < 0.03:
+            current = generator.randint(21, 108)
+
+        r = generator.random()
+        if r < 0.05:
+            notes.append([])
+        elif r < 0.3:
+            chord = sorted(generator.sample(range(current, current + 14), generator.randint(1, 5)))
+            if generator.random() < 0.2:
+                notes.append(dict(notes=chord, fingers=sorted(generator.sample(range(1, 6), len(chord)))))
+            else:
+                notes.append(chord)
+        elif r < 0.35:
+            notes.append(dict(notes=[current], fingers=[generator.randint(1, 5)]))
+        else:
+            notes.append(current)
+
+    return notes
+
+
+@skipIf(numpy is None, 'numpy is not installed')
+class TestNumpyEngine(TestCase):
+
+    def process(self, notes):
+        for left_or_right in ('right', 'left'):
+            self.assertEqual(computeFingering(notes, left_or_right),
+                             computeFingering(notes, left_or_right, engine='numpy'))
+
+    def test_empty(self):
+        self.process([])
+        self.process([[], []])
+
+    def test_single_notes(self):
+        self.process([60, 62, 64, 65, 67, 69, 71, 72])
+
+    def test_chords(self):
+        self.process([[60, 62, 64], [67, 71, 74], [60, 64, 67, 72, 76], [55, 59]])
+
+    def test_large_intervals(self):
+        self.process([21, 108, [30, 40, 50], 21, dict(notes=[100], fingers=[2]), 24])
+
+    def test_negative_fingers_left_hand(self):
+        notes = [ dict(notes=[60], fingers=[-1]), 62, 64, dict(notes=[60, 64], fingers=[-5, -3]), 62 ]
+        self.assertEqual(computeFingering(notes, 'left'), computeFingering(notes, 'left', engine='numpy'))
+
+    def test_random_notes(self):
+        for seed in range(50):
+            self.process(randomNotes(60, seed))
+
+    def test_long_piece(self):
+        self.process(randomNotes(3000, 0))
+
+    def test_memory_modes(self):
+        notes = randomNotes(1000, 1)
+        expected = computeFingering(notes, 'right')
+
+        for memory in ('full', 'compact', 'checkpoints'):
+            self.assertEqual(expected, computeFingering(notes, 'right', engine='numpy', memory=memory))
+
+    def test_beam(self):
+        notes = randomNotes(1000, 2)
+
+        for beam, margin in ((1, None), (3, None), (None, 5.0), (2, 8.0)):
+            self.assertEqual(computeFingering(notes, 'right', beam=beam, margin=margin),
+                             computeFingering(notes, 'right', engine='numpy', beam=beam, margin=margin))
+
+    def test_invalid_engine(self):
+        self.assertRaises(ValueError, computeFingering, [60], 'right', engine='invalid')
@@ -0,0 +1,90 @@
+# Grouping of timed notes into chords
+#
+# Use it by calling:
+#
+#    for entry in iterTimedNotes(events, tolerance=0.03):
+#        ...
+#
+# 'events' is an iterable of (onset, duration, MIDI note) tuples, for example the
+# notes of a performance. The elements yielded are in the formats accepted by
+# 'computeFingering()' (single notes, chords and rests), so they can be given
+# directly to the fingering algorithm, or to 'iterFingering()':
+#
+#    for fingered_notes in iterFingering(iterTimedNotes(events, presorted=True), 'right'):
+#        ...
+#
+# The events are processed in a single sweep, in the order of their onsets. They
+# are sorted first (in O(n log n), or O(n) if they are already sorted), unless
+# 'presorted' is True: then they are processed as they come, without keeping
+# them in memory.
+
+
+from operator import itemgetter
+
+
+#----------------------------------------------------------
+
+
+def iterTimedNotes(events, tolerance=0, min_rest=0, presorted=False):
+    """Group the provided (onset, duration, MIDI note) events into chords, and yield
+    them in the formats accepted by 'computeFingering()'
+
+    See 'iterTimedChords()' for a description of the parameters.
+    """
+    for onset, notes in iterTimedChords(events, tolerance, min_rest, presorted):
+        if len(notes) == 1:
+            yield notes[0]
+        else:
+            yield notes
+
+
+def iterTimedChords(events, tolerance=0, min_rest=0, presorted=False):
+    """Same as 'iterTimedNotes()', but yields (onset, notes) tuples, the notes of
+    the rests being empty lists
+
+    The notes starting at most 'tolerance' after the first note of a chord are
+    part of that chord (so an arpeggio slower than that isn't merged into a single
+    chord). A rest is inserted when no note is played during more than 'min_rest'
+    between two chords, its onset being the end of the last note.
+
+    If 'presorted' is True, the events must be sorted by onset, and are processed
+    as they come (a ValueError is raised otherwise).
+    """
+    if tolerance < 0:
+        raise ValueError('Invalid tolerance: %s' % tolerance)
+
+    if not presorted:
+        events = sorted(events, key=itemgetter(0))
+
+    chord_onset = None
+    chord = []
+
+    # End of the notes played so far
+    release = None
+
+    for onset, duration, note in events:
+        if (chord_onset is not None) and (onset <= chord_onset + tolerance):
+            if onset < chord_onset:
+                raise ValueError('The events are not sorted by onset')
+
+            if note not in chord:
+                chord.append(note)
+
+        else:
+            if chord_onset is not None:
+                chord.sort()
+                yield chord_onset, chord
+
+                if onset - release > min_rest:
+                    yield release, []
+
+            chord_onset = onset
+            chord = [ note ]
+
+        end = onset + duration
+        if (release is None) or (end > release):
+            release = end
+
+    if chord_onset is not None:
+        chord.sort()
+        yield chord_onset, chord
@@ -0,0 +1,263 @@
+# Vectorized implementation of the fingering algorithm, using numpy
+#
+# Used by 'computeFingering()' when called with engine='numpy'.
+#
+# The costs of all the transitions between two consecutive layers are stored
+# in a matrix (nodes of the previous layer x nodes of the current layer). Those
+# matrices are computed for many layers at once, using gathers from the cost
+# table. Each layer is then relaxed with a single min/argmin over the nodes of
+# the previous layer, and the best previous nodes are stored as integer arrays.
+#
+# The costs are summed in the same order than in 'fingering.calcCost()', and
+# ties are resolved the same way (the first best previous node is kept), so the
+# results are exactly the same than the ones of the Python implementation.
+#
+# The matrices are stored in the same cache than the ones of the Python
+# implementation ('fingering.TRANSITION_MATRICES'), so only the transitions
+# not seen recently are computed.
+
+
+import numpy
+from .cost import MIRROR_NOTES
+from .cost import MirroredCostTable
+from .cost import NB_FINGERS
+from .cost import moveTail
+from .cache import transitionKey
+from .fingering import TRANSITION_MATRICES
+from .fingering import getCostTable
+from .fingering import findBestPath
+from .fingering import getFingerOptions
+from .fingering import pruneScores
+
+
+#----------------------------------------------------------
+
+
+# Number of layers for which the transition matrices are computed at once
+BLOCK_SIZE = 1024
+
+NODE_INDICES = numpy.arange(64)
+
+
+#----------------------------------------------------------
+
+
+def computeBestPath(notes, left_or_right, memory='full', beam=None, margin=None):
+    """Compute the best fingering for the provided list of NotesInfo (see
+    'fingering.preprocessNotes()'), without rests
+    """
+    return findBestPath(notes, left_or_right, relaxLayers, memory, beam=beam, margin=margin)
+
+
+def relaxLayers(notes, left_or_right, scores, previous_infos, backpointers=None, compact=False,
+                beam=None, margin=None, relative=False):
+    """Vectorized version of 'fingering.relaxLayers()'"""
+    cost_table = getCostTable(left_or_right)
+
+    previous_layer = Layer(previous_infos.notes, previous_infos.fingers, left_or_right)
+    scores = numpy.asarray(scores, dtype=numpy.float64)
+
+    for start in range(0, len(notes), BLOCK_SIZE):
+        block = [ Layer(infos.notes, infos.fingers, left_or_right)
+                  for infos in notes[start:start + BLOCK_SIZE] ]
+
+        matrices = transitionMatrices(cost_table, [ previous_layer ] + block, left_or_right)
+
+        for matrix in matrices:
+            totals = scores[:, numpy.newaxis] + matrix
+            best_previous_nodes = totals.argmin(axis=0)
+            scores = totals[best_previous_nodes, NODE_INDICES[:matrix.shape[1]]]
+            if relative:
+                scores -= scores.min()
+
+            if (beam is not None) or (margin is not None):
+                scores = numpy.array(pruneScores(scores.tolist(), beam, margin))
+
+            if backpointers is not None:
+                backpointers.append(best_previous_nodes.astype(numpy.uint8).tobytes() if compact
+                                    else best_previous_nodes)
+
+        previous_layer = block[-1]
+
+    return scores
+
+
+#----------------------------------------------------------
+
+
+class Layer(object):
+    """The notes of a layer, with all their possible fingerings
+
+    'options' is an array of shape (number of fingerings, number of notes), and
+    'finger_options' contains the same fingerings, as lists.
+    """
+
+    def __init__(self, notes, fingers, left_or_right):
+        self.notes = notes
+        self.fingers = fingers
+
+        if (fingers is not None) or (len(notes) == 0):
+            fingers = fingers if fingers is not None else []
+            for finger in fingers:
+                # Like in 'fingering.computeLeftHandCost()', the fingers of the left
+                # hand can be negative
+                if left_or_right == 'left':
+                    finger = abs(finger)
+
+                if not (1 <= finger <= NB_FINGERS):
+                    raise KeyError('Invalid finger: %s' % finger)
+
+            self.finger_options = [ fingers ]
+            self.key = ('fixed', tuple(fingers))
+            self.options = numpy.array(self.finger_options, dtype=numpy.int64).reshape(1, len(notes))
+        else:
+            self.finger_options = getFingerOptions(len(notes), left_or_right)
+            self.key = ('free', len(notes))
+            self.options = freeOptions(len(notes), left_or_right)
+
+
+FREE_OPTIONS = {}
+
+def freeOptions(nb_notes, left_or_right):
+    """Return the array of all the fingering options for the provided number of notes"""
+    key = (nb_notes, left_or_right)
+
+    options = FREE_OPTIONS.get(key)
+    if options is None:
+        options = numpy.array(getFingerOptions(nb_notes, left_or_right), dtype=numpy.int64)
+        FREE_OPTIONS[key] = options
+
+    return options
+
+
+#----------------------------------------------------------
+
+
+def transitionMatrices(cost_table, layers, left_or_right):
+    """Return the matrices of the costs of the transitions between each pair of
+    consecutive layers of the provided list
+
+    The matrices are taken from the cache when possible. The other ones are
+    grouped by shape (number of notes and fingering options), so the costs of a
+    whole group are computed with a few numpy operations.
+    """
+    matrices = [ None ] * (len(layers) - 1)
+    keys = [ None ] * (len(layers) - 1)
+    groups = {}
+
+    # Other layer pairs sharing the key of a pair being computed
+    duplicates = {}
+
+    for index in range(1, len(layers)):
+        previous_layer = layers[index - 1]
+        current_layer = layers[index]
+
+        key = ('numpy', transitionKey(left_or_right, previous_layer.notes, previous_layer.fingers,
+                                      current_layer.notes, current_layer.fingers))
+
+        if key in duplicates:
+            duplicates[key].append(index)
+            continue
+
+        matrix = TRANSITION_MATRICES.get(key)
+        if matrix is not None:
+            matrices[index - 1] = matrix
+        else:
+            duplicates[key] = []
+            keys[index - 1] = key
+            groups.setdefault((previous_layer.key, current_layer.key), []).append(index)
+
+    for indices in groups.values():
+        previous_layer = layers[indices[0] - 1]
+        current_layer = layers[indices[0]]
+
+        previous_notes = numpy.array([ layers[i - 1].notes for i in indices ],
+                                     dtype=numpy.int64).reshape(len(indices), -1)
+        current_notes = numpy.array([ layers[i].notes for i in indices ],
+                                    dtype=numpy.int64).reshape(len(indices), -1)
+
+        costs = groupTransitionCosts(cost_table, previous_notes, current_notes,
+                                     previous_layer.options, current_layer.options)
+
+        for i, index in enumerate(indices):
+            # Copied so the cache doesn't keep the costs of the whole group alive
+            matrix = costs[i].copy()
+            matrix.flags.writeable = False
+            matrices[index - 1] = matrix
+            TRANSITION_MATRICES.put(keys[index - 1], matrix)
+
+            for duplicate in duplicates[keys[index - 1]]:
+                matrices[duplicate - 1] = matrix
+
+    return matrices
+
+
+def groupTransitionCosts(cost_table, previous_notes, current_notes, previous_options,
+                         current_options):
+    """Return the transition costs of a group of layer pairs sharing the same
+    fingering options, as an array of shape (number of pairs, number of previous
+    nodes, number of current nodes)
+
+    'previous_notes' and 'current_notes' have one row per pair of layers.
+    """
+    nb_pairs = previous_notes.shape[0]
+    costs = numpy.zeros((nb_pairs, previous_options.shape[0], current_options.shape[0]))
+
+    # Same order of the additions than in 'fingering.calcCost()'
+    for i in range(0, current_notes.shape[1]):
+        current_note = current_notes[:, i, numpy.newaxis, numpy.newaxis]
+        current_finger = current_options[numpy.newaxis, numpy.newaxis, :, i]
+
+        # Transition costs from each note of the previous nodes
+        for j in range(0, previous_notes.shape[1]):
+            costs += moveCosts(cost_table, previous_notes[:, j, numpy.newaxis, numpy.newaxis], current_note,
+                               previous_options[numpy.newaxis, :, j, numpy.newaxis], current_finger)
+
+    # "State" costs of using those fingers for the chords
+    state_costs = numpy.zeros((nb_pairs, 1, current_options.shape[0]))
+
+    for i in range(0, current_notes.shape[1] - 1):
+        state_costs += moveCosts(cost_table, current_notes[:, i, numpy.newaxis, numpy.newaxis],
+                                 current_notes[:, i + 1, numpy.newaxis, numpy.newaxis],
+                                 current_options[numpy.newaxis, numpy.newaxis, :, i],
+                                 current_options[numpy.newaxis, numpy.newaxis, :, i + 1])
+
+    costs += state_costs
+
+    return costs
+
+
+def moveCosts(cost_table, n1, n2, f1, f2):
+    """Vectorized version of 'cost_table.cost()': all the arguments are integer
+    arrays, broadcast together
+    """
+    if isinstance(cost_table, MirroredCostTable):
+        f1 = numpy.abs(f1)
+        f2 = numpy.abs(f2)
+
+        costs = moveCosts(cost_table.table, MIRROR_NOTES - n1, MIRROR_NOTES - n2, f1, f2)
+
+        unisons = numpy.frombuffer(cost_table.unisons, dtype=numpy.float64).reshape(
+            12, NB_FINGERS, NB_FINGERS)
+
+        return numpy.where(n1 == n2, unisons[n1 % 12, f1 - 1, f2 - 1], costs)
+
+    max_interval = cost_table.max_interval
+    interval = n2 - n1
+
+    values = numpy.frombuffer(cost_table.values, dtype=numpy.float64).reshape(
+        12, cost_table.nb_intervals, NB_FINGERS, NB_FINGERS)
+
+    costs = values[n1 % 12, numpy.clip(interval, -max_interval, max_interval) + max_interval,
+                   f1 - 1, f2 - 1]
+
+    # Moves larger than the table use the tail of the move formulas
+    far = numpy.abs(interval) > max_interval
+    if far.any():
+        tail_offsets = numpy.frombuffer(cost_table.tail_offsets, dtype=numpy.float64).reshape(
+            2, NB_FINGERS, NB_FINGERS)
+
+        offsets = tail_offsets[(interval < 0).astype(numpy.int64), f1 - 1, f2 - 1]
+        costs = numpy.where(far, moveTail(numpy.ceil(numpy.abs(interval) + offsets)), costs)
+
+    return costs
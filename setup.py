@@ -31,8 +31,12 @@ setup(
     classifiers = [
         'Development Status :: 3 - Alpha',
         'License :: OSI Approved :: MIT License',
-        'Programming Language :: Python :: 2.7',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
         'Topic :: Multimedia',
         'Intended Audience :: Developers',
     ],
@@ -44,8 +48,12 @@ setup(
         'piano_fingering.test',
     ],
 
+    python_requires = '>=3.8',
+
     install_requires = [],
-    extras_require={},
+    extras_require={
+        'numpy': ['numpy'],
+    },
 
     test_suite = 'piano_fingering.test',
 )